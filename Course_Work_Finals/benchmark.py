@@ -0,0 +1,283 @@
+# Benchmarks of the program on fixed generated graphs of friends (they don't need the Internet).
+# Run "python benchmark.py" to measure the program and compare results with the baseline, or
+# "python benchmark.py save" to measure it RUNS times and save median results as a new baseline.
+import gc
+import os
+import sys
+import time
+import statistics
+import tempfile
+import tracemalloc
+import matplotlib
+matplotlib.use("Agg")
+
+from user_tree_functions import *
+from fake_twitter import FakeTwitterAPI, generate_power_law_graph
+from name_cache import NameCache
+from graphic import full_trees_draw, only_links, draw_all_friends, wait_for_images
+
+
+# Graphs of friends: name, number of users, number of friends of each new user and depths of search:
+BENCHMARK_GRAPHS = [("small", 2000, 3, [1, 2, 3, 4]), ("medium", 20000, 5, [1, 2, 3, 4]),
+                    ("large", 100000, 3, [1, 2, 3])]
+
+# Graph and depth on which drawing functions are measured:
+DRAWING_GRAPH, DRAWING_DEPTH = "small", 2
+
+# Graph and depth on which drawing of a big tree (more than 10000 users) is measured:
+BIG_DRAWING_GRAPH, BIG_DRAWING_DEPTH = "medium", 3
+
+# Result is a regression if it is that many times worse than the baseline:
+TOLERANCE = 1.5
+
+# Time of drawing depends much on matplotlib and on saving files, so it may be that many times worse than the
+# baseline (its memory is compared with TOLERANCE):
+DRAWING_TOLERANCE = 3.0
+
+# Benchmarks of drawing functions (names without graph and depth):
+DRAWING_BENCHMARKS = ["full_trees_draw", "only_links", "draw_all_friends", "draw_all_friends_big"]
+
+BASELINE_FILE = "benchmark_baseline.txt"
+
+# Speed of the whole process may differ from run to run, so the baseline is the median of that many runs,
+# and regressions found by one run are checked by running benchmarks again until there are that many runs:
+RUNS = 3
+
+
+# In each of ROUNDS rounds fast functions are run again and again for at least MIN_ROUND_TIME seconds, and
+# the median of average times of rounds is taken (slow functions are run once in each round, so there are
+# enough rounds to make one slow or fast round not matter):
+ROUNDS = 7
+MIN_ROUND_TIME = 0.1
+
+
+def measure(func):
+    """
+    Run func() to measure its time (fast functions are run many times) and once more to measure peak of
+    memory it uses (memory tracing slows it down, so time is measured without it). Time is processor time
+    of the program (of all its threads), so other programs which run at the same time don't change it.
+    Return result of func(), time in seconds and memory peak in kilobytes.
+    :param func: function
+    :return: tuple
+    """
+    round_times = []
+
+    # Garbage collector is switched off, so it doesn't run at random moments:
+    gc.disable()
+    try:
+        for i in range(ROUNDS):
+            runs_num = 0
+            start_time = time.process_time()
+            while runs_num == 0 or (time.process_time() - start_time < MIN_ROUND_TIME and runs_num < 100):
+                result = func()
+                runs_num += 1
+
+            round_times.append((time.process_time() - start_time) / runs_num)
+    finally:
+        gc.enable()
+    seconds = statistics.median(round_times)
+
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return result, seconds, peak / 1024
+
+
+def saved(result):
+    """
+    Wait until images which are saved in the background are saved, and return result.
+    :param result: object
+    :return: object
+    """
+    wait_for_images()
+    return result
+
+
+def run_benchmarks():
+    """
+    Measure all benchmarks. Return dictionary of pairs (time in seconds, memory peak in kilobytes) by names
+    of benchmarks.
+    :return: dict
+    """
+    results = dict()
+    temp_dir = tempfile.mkdtemp()
+
+    def record(name, func):
+        """
+        Measure func() and record the result as benchmark with name.
+        :param name: str
+        :param func: function
+        :return: object
+        """
+        result, seconds, peak = measure(func)
+        results[name] = (seconds, peak)
+        print("{:<40} {:>10.4f} s {:>12.1f} KB".format(name, seconds, peak))
+        return result
+
+    for graph_name, users_num, friends_num, depths in BENCHMARK_GRAPHS:
+        friends_dict = generate_power_law_graph(users_num, friends_num, seed=0)
+        friends_dict = dict((id_num, friends_ids.tolist()) for id_num, friends_ids in friends_dict.items())
+
+        # Roots are users who are neither the oldest (they are friends of almost everybody) nor the newest
+        # (they have very few friends):
+        id_1, id_2 = users_num // 100, users_num // 100 + 1
+
+        for depth in depths:
+            prefix = "{}/depth_{}/".format(graph_name, depth)
+
+            tree_1 = record(prefix + "tree_from_dict", lambda: tree_from_dict(id_1, friends_dict, depth))
+            tree_2 = tree_from_dict(id_2, friends_dict, depth)
+            record(prefix + "graph_from_dict", lambda: graph_from_dict(id_1, friends_dict, depth))
+
+            mutual_ids = record(prefix + "find_mutual_ids", lambda: find_mutual_ids(tree_1, tree_2))
+            if mutual_ids:
+                record(prefix + "find_min_link", lambda: find_min_link(mutual_ids, tree_1, tree_2))
+                record(prefix + "link_to_list", lambda: [link_to_list(id_num, tree_1, tree_2)
+                                                         for id_num in mutual_ids])
+
+            text = record(prefix + "in_file_tree", lambda: tree_1.in_file_tree())
+
+            file_name = os.path.join(temp_dir, "tree.txt")
+            file = open(file_name, "w")
+            file.write(text)
+            file.close()
+            record(prefix + "dict_from_file", lambda: dict_from_file(file_name))
+
+            # Drawing (names of users are got from fake Twitter, trees of the newest users are drawn,
+            # because they are small enough):
+            if graph_name == DRAWING_GRAPH and depth == DRAWING_DEPTH:
+                set_api(FakeTwitterAPI(friends_dict))
+                set_name_cache(NameCache(os.path.join(temp_dir, "names.txt")))
+                image_name = os.path.join(temp_dir, "image.png")
+
+                tree_1 = tree_from_dict(users_num - 1, friends_dict, depth)
+                tree_2 = tree_from_dict(users_num - 2, friends_dict, depth)
+                links = [link_to_list(id_num, tree_1, tree_2) for id_num in find_mutual_ids(tree_1, tree_2)]
+
+                record(prefix + "full_trees_draw",
+                       lambda: saved(full_trees_draw(tree_1, tree_2, False, True, image_name)))
+                record(prefix + "only_links", lambda: saved(only_links(links, False, True, image_name)))
+                record(prefix + "draw_all_friends",
+                       lambda: saved(draw_all_friends(tree_1, False, True, image_name)))
+
+            if graph_name == BIG_DRAWING_GRAPH and depth == BIG_DRAWING_DEPTH:
+                set_api(FakeTwitterAPI(friends_dict))
+                set_name_cache(NameCache(os.path.join(temp_dir, "names.txt")))
+                image_name = os.path.join(temp_dir, "image.png")
+
+                graph = graph_from_dict(id_1, friends_dict, depth)
+                record(prefix + "draw_all_friends_big",
+                       lambda: saved(draw_all_friends(graph, False, True, image_name)))
+
+    return results
+
+
+def median_results(results_list):
+    """
+    Return dictionary of pairs (median time, median memory peak) by names of benchmarks from results of
+    several runs of benchmarks (see run_benchmarks()).
+    :param results_list: list of dict
+    :return: dict
+    """
+    results = dict()
+
+    for name in results_list[0]:
+        runs = [run_results[name] for run_results in results_list if name in run_results]
+        results[name] = (statistics.median(seconds for seconds, peak in runs),
+                         statistics.median(peak for seconds, peak in runs))
+
+    return results
+
+
+def read_baseline(file_name):
+    """
+    Read results of benchmarks from a file. Each line of the file looks like this:
+    <name> <time in seconds> <memory peak in kilobytes>
+    :param file_name: str
+    :return: dict
+    """
+    results = dict()
+    if not os.path.exists(file_name):
+        return results
+
+    file = open(file_name, "r")
+    lines = file.readlines()
+    file.close()
+
+    for line in lines:
+        words = line.split()
+        if len(words) == 3:
+            results[words[0]] = (float(words[1]), float(words[2]))
+
+    return results
+
+
+def write_baseline(file_name, results):
+    """
+    Write results of benchmarks into a file (see read_baseline()).
+    :param file_name: str
+    :param results: dict
+    :return: NoneType
+    """
+    file = open(file_name, "w")
+    for name in sorted(results):
+        file.write("{} {:.6f} {:.1f}\n".format(name, results[name][0], results[name][1]))
+    file.close()
+
+
+def find_regressions(results, baseline, tolerance=TOLERANCE, drawing_tolerance=DRAWING_TOLERANCE):
+    """
+    Return list of descriptions of benchmarks whose time or memory peak is more than tolerance times
+    worse than in the baseline (time of drawing benchmarks is compared with drawing_tolerance). Very
+    short times are not compared, because they are mostly noise.
+    :param results: dict
+    :param baseline: dict
+    :param tolerance: int or float
+    :param drawing_tolerance: int or float
+    :return: list of str
+    """
+    result_list = []
+
+    for name in sorted(results):
+        if name not in baseline:
+            continue
+
+        seconds, peak = results[name]
+        base_seconds, base_peak = baseline[name]
+        time_tolerance = drawing_tolerance if name.split("/")[-1] in DRAWING_BENCHMARKS else tolerance
+
+        if seconds > 0.005 and seconds > base_seconds * time_tolerance:
+            result_list.append("{}: time {:.4f} s (baseline {:.4f} s)".format(name, seconds, base_seconds))
+        if peak > 64 and peak > base_peak * tolerance:
+            result_list.append("{}: memory {:.1f} KB (baseline {:.1f} KB)".format(name, peak, base_peak))
+
+    return result_list
+
+
+if __name__ == "__main__":
+    runs_results = [run_benchmarks()]
+
+    if len(sys.argv) > 1 and sys.argv[1] == "save":
+        while len(runs_results) < RUNS:
+            print("Run {} of {}:".format(len(runs_results) + 1, RUNS))
+            runs_results.append(run_benchmarks())
+        write_baseline(BASELINE_FILE, median_results(runs_results))
+        print("Baseline was saved into '{}'.".format(BASELINE_FILE))
+    else:
+        baseline_results = read_baseline(BASELINE_FILE)
+        regressions = find_regressions(runs_results[0], baseline_results)
+
+        # Regressions must stay in the median of several runs:
+        while regressions and len(runs_results) < RUNS:
+            print("Checking {} regressions, run {} of {}:".format(len(regressions), len(runs_results) + 1, RUNS))
+            runs_results.append(run_benchmarks())
+            regressions = find_regressions(median_results(runs_results), baseline_results)
+
+        if regressions:
+            print("Regressions:")
+            for regression in regressions:
+                print(regression)
+            sys.exit(1)
+        print("No regressions.")
@@ -0,0 +1,170 @@
+import os
+import threading
+
+
+class CrawlCheckpoint:
+    """
+    Checkpoint of a search of friends kept in a text file, so a long search which was stopped can be
+    continued later. The file keeps the instruction which started the search, its depth and friends of
+    all users whose friends were already got. Friends are written into the file every interval users (and
+    when the search stops), new users are added to the end of the file, so it is never rewritten.
+    """
+    def __init__(self, file_name, interval=50):
+        """
+        Initialise CrawlCheckpoint by name of its file and number of users whose friends are written into
+        the file at once.
+        :param file_name: str
+        :param interval: int
+        """
+        # Checking arguments:
+        if not isinstance(file_name, str) or not file_name.endswith(".txt"):
+            raise ValueError("Name of the file must be str, and have .txt extension.")
+        if not isinstance(interval, int) or interval < 1:
+            raise ValueError("Interval of a checkpoint must be int bigger than zero.")
+
+        self._file_name = file_name
+        self._interval = interval
+        self._lock = threading.Lock()
+
+        self._command = None
+        self._depth = None
+        self._friends = dict()
+
+        # Users whose friends are not written into the file yet:
+        self._pending = []
+
+    def get_command(self):
+        """
+        Return instruction which started the search.
+        :return: str or NoneType
+        """
+        return self._command
+
+    def get_depth(self):
+        """
+        Return depth of the search.
+        :return: int or NoneType
+        """
+        return self._depth
+
+    def get_friends(self):
+        """
+        Return dictionary of ids of friends of users whose friends were already got by their ids.
+        :return: dict
+        """
+        with self._lock:
+            return dict(self._friends)
+
+    def exists(self):
+        """
+        Return True if the file of a checkpoint exists.
+        :return: bool
+        """
+        return os.path.exists(self._file_name)
+
+    def start(self, command, depth):
+        """
+        Start a new search (old checkpoint is removed). First line of the file looks like this:
+        <depth> <instruction>
+        :param command: str
+        :param depth: int
+        :return: NoneType
+        """
+        # Checking arguments:
+        if not isinstance(command, str) or not isinstance(depth, int):
+            raise ValueError("Instruction must be str, and depth must be int.")
+
+        with self._lock:
+            self._command = command
+            self._depth = depth
+            self._friends = dict()
+            self._pending = []
+
+            file = open(self._file_name, "w")
+            file.write("{} {}\n".format(depth, command))
+            file.close()
+
+    def load(self):
+        """
+        Read a checkpoint from its file. Each line of the file after the first one looks like this:
+        <id> <id of friend 1> <id of friend 2> ...
+        Return False if there is no file or it is corrupted, True otherwise.
+        :return: bool
+        """
+        if not self.exists():
+            return False
+
+        file = open(self._file_name, "r")
+        lines = file.readlines()
+        file.close()
+
+        # Checking the first line:
+        if not lines or len(lines[0].split()) < 2 or not lines[0].split()[0].isdigit():
+            return False
+
+        friends = dict()
+        for line in lines[1:]:
+            words = line.split()
+            # Last line may be written only partly, if the program was stopped at that time:
+            if not line.endswith("\n") or not words or False in [word.isdigit() for word in words]:
+                continue
+            friends[int(words[0])] = [int(word) for word in words[1:]]
+
+        with self._lock:
+            self._depth = int(lines[0].split()[0])
+            self._command = lines[0].split(maxsplit=1)[1].strip()
+            self._friends = friends
+            self._pending = []
+
+        return True
+
+    def add(self, id_num, friends_ids):
+        """
+        Add friends of the user with id_num to a checkpoint. They are written into the file every interval
+        users.
+        :param id_num: int
+        :param friends_ids: list of int
+        :return: NoneType
+        """
+        with self._lock:
+            # No search is going on:
+            if self._command is None:
+                return None
+
+            self._friends[id_num] = friends_ids
+            self._pending.append(id_num)
+            is_full = len(self._pending) >= self._interval
+
+        if is_full:
+            self.save()
+
+    def save(self):
+        """
+        Write friends of users which are not in the file yet into the end of it.
+        :return: NoneType
+        """
+        with self._lock:
+            if not self._pending:
+                return None
+
+            lines = [" ".join([str(id_num)] + [str(friend_id) for friend_id in self._friends[id_num]]) + "\n"
+                     for id_num in self._pending]
+            self._pending = []
+
+            file = open(self._file_name, "a")
+            file.write("".join(lines))
+            file.close()
+
+    def remove(self):
+        """
+        Finish a search: remove the file of a checkpoint.
+        :return: NoneType
+        """
+        with self._lock:
+            self._command = None
+            self._depth = None
+            self._friends = dict()
+            self._pending = []
+
+            if os.path.exists(self._file_name):
+                os.remove(self._file_name)
@@ -0,0 +1,180 @@
+import time
+import random
+import threading
+import tweepy
+from array import array
+from rate_limit import Clock
+
+
+class FakeTwitterUser:
+    """
+    User of fake Twitter API (has the same attributes as tweepy.models.User which are used by the program).
+    """
+    def __init__(self, id_num, followers_count=0):
+        """
+        Initialise FakeTwitterUser by his id and number of his followers. His screen name is "user_<id>".
+        :param id_num: int
+        :param followers_count: int
+        """
+        self.id = id_num
+        self.screen_name = "user_" + str(id_num)
+        self.followers_count = followers_count
+
+
+class FakeTwitterAPI:
+    """
+    Fake Twitter API which works without the Internet and can be used everywhere instead of tweepy.API
+    (for testing and measuring speed of the program). Friends of users are taken from a dictionary, each
+    request takes latency seconds, ids of friends are returned by page_size at a time, and requests to
+    each endpoint are limited like on Twitter (see RateLimitScheduler.DEFAULT_LIMITS): if there are too
+    many of them in a window, tweepy.error.RateLimitError is raised.
+    """
+    def __init__(self, friends_dict, latency=0, limits=None, clock=None, page_size=5000):
+        """
+        Initialise FakeTwitterAPI by dictionary of lists (or arrays) of ids of friends of users by their
+        ids, latency of requests in seconds, limits of endpoints (endpoint: (number of requests, window in
+        seconds), there are no limits by default), clock used for windows and size of a page of ids.
+        :param friends_dict: dict
+        :param latency: int or float
+        :param limits: dict or NoneType
+        :param clock: Clock or NoneType
+        :param page_size: int
+        """
+        if limits is None:
+            limits = dict()
+        if clock is None:
+            clock = Clock()
+
+        # Checking arguments:
+        if not isinstance(friends_dict, dict) or not isinstance(limits, dict) or not isinstance(clock, Clock):
+            raise ValueError("Friends must be dict, limits must be dict, and clock must be Clock.")
+        if not isinstance(page_size, int) or page_size < 1:
+            raise ValueError("Size of a page must be int bigger than zero.")
+
+        self.friends_dict = friends_dict
+        self.latency = latency
+        self.limits = limits
+        self.clock = clock
+        self.page_size = page_size
+        self._lock = threading.Lock()
+
+        # Number of requests in each window of each endpoint:
+        self.windows = dict()
+
+        # Number of requests for friends and for names of users:
+        self.requests_num = 0
+
+        # If it is not None, connection is "lost" after that many requests:
+        self.crash_after = None
+
+    def _request(self, endpoint, counted=True):
+        """
+        Make one request to an endpoint: wait for latency, count the request and check limits.
+        :param endpoint: str
+        :param counted: bool
+        :return: NoneType
+        """
+        time.sleep(self.latency)
+
+        with self._lock:
+            if counted:
+                self.requests_num += 1
+                if self.crash_after is not None and self.requests_num > self.crash_after:
+                    raise ConnectionError("Connection lost.")
+
+            if endpoint in self.limits:
+                limit, window_size = self.limits[endpoint]
+                window = (endpoint, int(self.clock.time() // window_size))
+                self.windows[window] = self.windows.get(window, 0) + 1
+                if self.windows[window] > limit:
+                    raise tweepy.error.RateLimitError("Rate limit exceeded.")
+
+    def get_user(self, user_name):
+        """
+        Return user by his id or screen name. Raise tweepy.error.TweepError if there is no such user.
+        :param user_name: int or str
+        :return: FakeTwitterUser
+        """
+        self._request("get_user", counted=False)
+
+        id_num = user_name
+        if isinstance(user_name, str):
+            id_num = int(user_name[5:]) if user_name.startswith("user_") and user_name[5:].isdigit() else None
+
+        if id_num not in self.friends_dict:
+            raise tweepy.error.TweepError("User not found.")
+        return FakeTwitterUser(id_num)
+
+    def friends_ids(self, user_id, cursor=-1):
+        """
+        Return page of ids of friends of the user and pair (previous cursor, next cursor). Cursor is index
+        of the first id on a page, next cursor is 0 on the last page.
+        :param user_id: int
+        :param cursor: int
+        :return: tuple
+        """
+        self._request("friends_ids")
+
+        friends_ids = self.friends_dict.get(user_id, [])
+        start = max(cursor, 0)
+        ids = list(friends_ids[start:start + self.page_size])
+
+        if start + self.page_size < len(friends_ids):
+            next_cursor = start + self.page_size
+        else:
+            next_cursor = 0
+
+        return ids, (start, next_cursor)
+
+    def lookup_users(self, user_ids):
+        """
+        Return users with given ids (no more than 100 at a time, users who don't exist are skipped).
+        :param user_ids: list of int
+        :return: list of FakeTwitterUser
+        """
+        self._request("lookup_users")
+
+        if len(user_ids) > 100:
+            raise tweepy.error.TweepError("Too many users.")
+        return [FakeTwitterUser(id_num) for id_num in user_ids if id_num in self.friends_dict]
+
+
+def generate_power_law_graph(users_num, friends_num, seed=None):
+    """
+    Return dictionary of arrays of ids of friends of users 0, 1, ..., users_num - 1 generated like
+    Barabasi-Albert graph: each new user makes friends with friends_num users who are already there, and
+    users with more friends are chosen more often (so few users have very many friends, like on Twitter).
+    Friendship goes both ways, so there are about 2 * users_num * friends_num ids in all arrays.
+    :param users_num: int
+    :param friends_num: int
+    :param seed: int or NoneType
+    :return: dict
+    """
+    # Checking arguments:
+    if not isinstance(users_num, int) or not isinstance(friends_num, int) or not (0 < friends_num < users_num):
+        raise ValueError("Numbers of users and friends must be int, and 0 < friends_num < users_num.")
+
+    generator = random.Random(seed)
+    friends_dict = dict((id_num, array("q")) for id_num in range(users_num))
+
+    # Each user appears here once for each his friend, so random choice from it prefers popular users:
+    ends = array("q")
+
+    # First friends_num users are friends of the next one:
+    targets = list(range(friends_num))
+
+    for id_num in range(friends_num, users_num):
+        for target in targets:
+            friends_dict[id_num].append(target)
+            friends_dict[target].append(id_num)
+
+        ends.extend(targets)
+        ends.extend([id_num] * friends_num)
+
+        # Choosing friends of the next user:
+        new_targets = set()
+        while len(new_targets) < friends_num:
+            new_targets.add(ends[generator.randrange(len(ends))])
+        targets = list(new_targets)
+
+    return friends_dict
@@ -0,0 +1,46 @@
+import tweepy
+from fake_twitter import *
+from rate_limit import *
+
+
+# Testing:
+print("Testing generating graph of friends:")
+friends_dict = generate_power_law_graph(2000, 3, seed=1)
+friends_nums = sorted(len(friends_ids) for friends_ids in friends_dict.values())
+print(len(friends_dict), sum(friends_nums), friends_nums[0], friends_nums[-1])
+assert len(friends_dict) == 2000 and sum(friends_nums) == 2 * 3 * (2000 - 3)
+assert friends_nums[0] >= 3 and friends_nums[-1] > 50
+for id_num, friends_ids in friends_dict.items():
+    assert id_num not in friends_ids and len(set(friends_ids)) == len(friends_ids)
+    for friend_id in friends_ids:
+        assert id_num in friends_dict[friend_id]
+assert generate_power_law_graph(2000, 3, seed=1) == friends_dict
+
+print("Testing getting users and their friends from fake Twitter:")
+fake_api = FakeTwitterAPI(friends_dict, page_size=10)
+print(fake_api.get_user("user_5").id, fake_api.get_user(7).screen_name)
+assert fake_api.get_user("user_5").id == 5 and fake_api.get_user(7).screen_name == "user_7"
+for user_name in ("user_2000", "somebody", -1):
+    try:
+        fake_api.get_user(user_name)
+        assert False
+    except tweepy.error.TweepError:
+        pass
+ids, cursors = fake_api.friends_ids(0, cursor=10)
+assert ids == list(friends_dict[0][10:20]) and cursors == (10, 20)
+assert [user.id for user in fake_api.lookup_users([1, 2, 5000])] == [1, 2]
+
+print("Testing limits of fake Twitter:")
+fake_clock = FakeClock()
+fake_api = FakeTwitterAPI(friends_dict, limits={"friends_ids": (2, 60)}, clock=fake_clock)
+fake_api.friends_ids(1)
+fake_api.friends_ids(1)
+try:
+    fake_api.friends_ids(1)
+    assert False
+except tweepy.error.RateLimitError:
+    pass
+fake_clock.sleep(60)
+fake_api.friends_ids(1)
+print(fake_api.requests_num)
+assert fake_api.requests_num == 4
@@ -0,0 +1,261 @@
+from array import array
+from profiler import profiler, profiled
+
+
+class FriendGraph:
+    """
+    Compact graph of friends of users found by searching from one user (root). Unlike tree of User
+    objects, each user is stored only once: his id is turned into an index, and lists of friends are kept
+    as arrays of indices. Level and parent of the first occurrence of each user are kept too, so graph can
+    be used everywhere instead of a tree.
+    """
+    def __init__(self, root_id):
+        """
+        Initialise FriendGraph by id of the root user.
+        :param root_id: int
+        """
+        # Checking argument:
+        if not isinstance(root_id, int):
+            raise ValueError("User Id number must be int.")
+
+        # Index of each id:
+        self._index = dict()
+
+        # Id, level and index of parent of each user (by index):
+        self._ids = array("q")
+        self._levels = array("b")
+        self._parents = array("q")
+
+        # Arrays of indices of friends of each user (None if friends were not added):
+        self._friends = []
+
+        # Arrays of indices of users of each level:
+        self._level_users = []
+
+        # Adding root:
+        self._add_user(root_id, 0, -1)
+
+    def _add_user(self, id_num, level, parent_index):
+        """
+        Add user who is not in a graph yet and return his index.
+        :param id_num: int
+        :param level: int
+        :param parent_index: int
+        :return: int
+        """
+        index = len(self._ids)
+        self._index[id_num] = index
+        self._ids.append(id_num)
+        self._levels.append(level)
+        self._parents.append(parent_index)
+        self._friends.append(None)
+
+        if level == len(self._level_users):
+            self._level_users.append(array("q"))
+        self._level_users[level].append(index)
+
+        return index
+
+    def _index_of(self, id_num):
+        """
+        Return index of the user with id_num. Raise ValueError if there is no such user in a graph.
+        :param id_num: int
+        :return: int
+        """
+        try:
+            return self._index[id_num]
+        except KeyError:
+            raise ValueError("There is no user with such id in a graph.")
+
+    def get_root_id(self):
+        """
+        Return id of the root user.
+        :return: int
+        """
+        return self._ids[0]
+
+    def has_user(self, id_num):
+        """
+        Return True if user with id_num is in a graph.
+        :param id_num: int
+        :return: bool
+        """
+        return id_num in self._index
+
+    def __contains__(self, id_num):
+        """
+        Return True if user with id_num is in a graph.
+        :param id_num: int
+        :return: bool
+        """
+        return self.has_user(id_num)
+
+    def __len__(self):
+        """
+        Return number of users in a graph.
+        :return: int
+        """
+        return len(self._ids)
+
+    @profiled("set_friends")
+    def set_friends(self, id_num, friends_ids):
+        """
+        Set friends of the user with id_num (he must be in a graph already). Users who are not in a graph
+        yet are added to the next level with this user as a parent.
+        :param id_num: int
+        :param friends_ids: list of int
+        :return: NoneType
+        """
+        # Checking arguments:
+        if not isinstance(friends_ids, list) or False in [isinstance(friend_id, int)
+                                                          for friend_id in friends_ids]:
+            raise ValueError("List of friends must be a list containing ids (int) only.")
+
+        index = self._index_of(id_num)
+        level = self._levels[index] + 1
+        users_num = len(self._ids)
+
+        friends = array("q")
+        for friend_id in friends_ids:
+            friend_index = self._index.get(friend_id)
+            # If user is not in a graph yet:
+            if friend_index is None:
+                friend_index = self._add_user(friend_id, level, index)
+            friends.append(friend_index)
+
+        self._friends[index] = friends
+        profiler.count("users_created", len(self._ids) - users_num)
+
+    def has_friends_set(self, id_num):
+        """
+        Return True if friends of the user with id_num were already set.
+        :param id_num: int
+        :return: bool
+        """
+        return self._friends[self._index_of(id_num)] is not None
+
+    def get_friends_ids(self, id_num, ignore_repeated=True):
+        """
+        Return list of ids of friends of the user with id_num. If ignore_repeated is True, only users whose
+        first occurrence is as friends of this user are returned (same as User.get_children()).
+        :param id_num: int
+        :param ignore_repeated: bool
+        :return: list of int
+        """
+        index = self._index_of(id_num)
+
+        # If friends of the user were not set:
+        if self._friends[index] is None:
+            return []
+
+        return [self._ids[friend_index] for friend_index in self._friends[index]
+                if not ignore_repeated or self._parents[friend_index] == index]
+
+    def friends_lists(self):
+        """
+        Return list of pairs (id of the user, list of ids of all his friends) for all users whose friends
+        were set.
+        :return: list of tuple
+        """
+        return [(self._ids[index], [self._ids[friend_index] for friend_index in self._friends[index]])
+                for index in range(len(self._ids)) if self._friends[index] is not None]
+
+    def get_level(self, id_num):
+        """
+        Return level of the first occurrence of the user with id_num (level of a root is 0).
+        :param id_num: int
+        :return: int
+        """
+        return self._levels[self._index_of(id_num)]
+
+    def get_parent_id(self, id_num):
+        """
+        Return id of the parent of the first occurrence of the user with id_num (None for the root).
+        :param id_num: int
+        :return: int or NoneType
+        """
+        parent_index = self._parents[self._index_of(id_num)]
+        if parent_index == -1:
+            return None
+        return self._ids[parent_index]
+
+    def height(self):
+        """
+        Return height of a graph (biggest level of its users).
+        :return: int
+        """
+        return len(self._level_users) - 1
+
+    def users_of_level(self, level_num):
+        """
+        Return ids of all users of a level level_num.
+        :param level_num: int
+        :return: list of int
+        """
+        # Checking input:
+        if not isinstance(level_num, int):
+            raise ValueError("Number of level in graph of users must be int.")
+
+        if not (0 <= level_num < len(self._level_users)):
+            return []
+
+        return [self._ids[index] for index in self._level_users[level_num]]
+
+    def all_ids(self):
+        """
+        Return ids of all users of a graph (including the root) in order they were added.
+        :return: list of int
+        """
+        return list(self._ids)
+
+    def levels_dict(self):
+        """
+        Return dictionary of levels of all users of a graph by their ids (in order users were added).
+        :return: dict
+        """
+        return dict(zip(self._ids, self._levels))
+
+    def link_to_root(self, id_num):
+        """
+        Return list of ids of users connecting the root with the user with id_num (including both).
+        :param id_num: int
+        :return: list of int
+        """
+        result_list = []
+        index = self._index_of(id_num)
+
+        while index != -1:
+            result_list.append(self._ids[index])
+            index = self._parents[index]
+
+        return result_list[::-1]
+
+    def edges(self):
+        """
+        Return list of pairs (parent id, friend id) for the first occurrences of all users (edges of a tree
+        of users).
+        :return: list of tuple
+        """
+        return [(self._ids[self._parents[index]], self._ids[index]) for index in range(1, len(self._ids))]
+
+    def in_file_tree(self):
+        """
+        Return in-file representation of all users of a graph whose friends were set (same format as
+        User.in_file_tree()).
+        :return: str
+        """
+        lines = []
+        for index in range(len(self._ids)):
+            if self._friends[index] is not None:
+                lines.append(str(self._ids[index]) + "\n")
+                for friend_index in self._friends[index]:
+                    lines.append("-" + str(self._ids[friend_index]) + "\n")
+
+        return "".join(lines)
+
+    def __repr__(self):
+        """
+        Return short string representation of a FriendGraph.
+        :return: str
+        """
+        return "FriendGraph({}, users={})".format(self.get_root_id(), len(self))
@@ -0,0 +1,263 @@
+import os
+import sqlite3
+import threading
+from array import array
+from rate_limit import Clock
+from user_tree_functions import dict_from_file
+
+
+class FriendsCache:
+    """
+    Cache of friends of users kept in SQLite database file. Ids of friends of each user are packed into
+    an array of 8-byte integers, and users are indexed by their ids, so friends of one user can be read
+    without reading the whole cache. Time when friends of each user were got is kept too, and friends
+    which are older than ttl seconds are considered not fresh.
+    """
+    def __init__(self, file_name, ttl=None, clock=None):
+        """
+        Initialise FriendsCache by name of its database file (it is created if it doesn't exist), time to
+        live of information about friends in seconds (None means forever) and clock.
+        :param file_name: str
+        :param ttl: int or float or NoneType
+        :param clock: Clock or NoneType
+        """
+        if clock is None:
+            clock = Clock()
+
+        # Checking arguments:
+        if not isinstance(file_name, str) or not file_name.endswith(".db"):
+            raise ValueError("Name of the file must be str, and have .db extension.")
+        if not isinstance(clock, Clock):
+            raise ValueError("Clock of a cache must be Clock.")
+
+        self._file_name = file_name
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.set_ttl(ttl)
+
+        # Connection is used by many threads, so it is protected by lock:
+        self._connection = sqlite3.connect(file_name, check_same_thread=False)
+        self._connection.execute("CREATE TABLE IF NOT EXISTS friends (user_id INTEGER PRIMARY KEY, "
+                                 "friends_ids BLOB NOT NULL, fetched_at REAL NOT NULL DEFAULT 0)")
+
+        # Caches created before times were kept don't have such column (their users are not fresh):
+        columns = [row[1] for row in self._connection.execute("PRAGMA table_info(friends)")]
+        if "fetched_at" not in columns:
+            self._connection.execute("ALTER TABLE friends ADD COLUMN fetched_at REAL NOT NULL DEFAULT 0")
+
+        self._connection.commit()
+
+    def set_ttl(self, ttl):
+        """
+        Set time to live of information about friends in seconds (None means forever).
+        :param ttl: int or float or NoneType
+        :return: NoneType
+        """
+        # Checking argument:
+        if ttl is not None and (not isinstance(ttl, (int, float)) or ttl < 0):
+            raise ValueError("Time to live must be number not less than zero or None.")
+
+        self._ttl = ttl
+
+    def get_ttl(self):
+        """
+        Return time to live of information about friends in seconds.
+        :return: int or float or NoneType
+        """
+        return self._ttl
+
+    def get_file_name(self):
+        """
+        Return name of the database file.
+        :return: str
+        """
+        return self._file_name
+
+    @staticmethod
+    def _pack(friends_ids):
+        """
+        Return ids packed into bytes.
+        :param friends_ids: list of int
+        :return: bytes
+        """
+        return array("q", friends_ids).tobytes()
+
+    @staticmethod
+    def _unpack(packed_ids):
+        """
+        Return list of ids packed into bytes.
+        :param packed_ids: bytes
+        :return: list of int
+        """
+        ids = array("q")
+        ids.frombytes(packed_ids)
+        return ids.tolist()
+
+    def get_friends(self, id_num):
+        """
+        Return list of ids of friends of the user with id_num or None if he is not in a cache.
+        :param id_num: int
+        :return: list of int or NoneType
+        """
+        with self._lock:
+            row = self._connection.execute("SELECT friends_ids FROM friends WHERE user_id = ?",
+                                           (id_num,)).fetchone()
+
+        if row is None:
+            return None
+        return self._unpack(row[0])
+
+    def get_fetch_time(self, id_num):
+        """
+        Return time when friends of the user with id_num were got (0 if it is unknown) or None if he is not
+        in a cache.
+        :param id_num: int
+        :return: float or NoneType
+        """
+        with self._lock:
+            row = self._connection.execute("SELECT fetched_at FROM friends WHERE user_id = ?",
+                                           (id_num,)).fetchone()
+
+        if row is None:
+            return None
+        return row[0]
+
+    def is_fresh(self, id_num):
+        """
+        Return True if friends of the user with id_num are in a cache and are not older than time to live.
+        :param id_num: int
+        :return: bool
+        """
+        fetch_time = self.get_fetch_time(id_num)
+
+        if fetch_time is None:
+            return False
+        return self._ttl is None or self._clock.time() - fetch_time <= self._ttl
+
+    def set_friends(self, id_num, friends_ids):
+        """
+        Write ids of friends of the user with id_num into a cache (old information about him is replaced).
+        :param id_num: int
+        :param friends_ids: list of int
+        :return: NoneType
+        """
+        self.set_many_friends([(id_num, friends_ids)])
+
+    def set_many_friends(self, users_friends, fetch_time=None):
+        """
+        Write friends of many users into a cache at once. fetch_time is time when they were got (now by
+        default).
+        :param users_friends: list of tuple (id of the user, list of ids of his friends)
+        :param fetch_time: float or NoneType
+        :return: NoneType
+        """
+        if fetch_time is None:
+            fetch_time = self._clock.time()
+
+        with self._lock:
+            self._connection.executemany("INSERT OR REPLACE INTO friends (user_id, friends_ids, fetched_at) "
+                                         "VALUES (?, ?, ?)",
+                                         [(id_num, self._pack(friends_ids), fetch_time)
+                                          for id_num, friends_ids in users_friends])
+            self._connection.commit()
+
+    def __contains__(self, id_num):
+        """
+        Return True if friends of the user with id_num are in a cache.
+        :param id_num: int
+        :return: bool
+        """
+        with self._lock:
+            row = self._connection.execute("SELECT 1 FROM friends WHERE user_id = ?", (id_num,)).fetchone()
+
+        return row is not None
+
+    def __len__(self):
+        """
+        Return number of users in a cache.
+        :return: int
+        """
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM friends").fetchone()[0]
+
+    def items(self):
+        """
+        Return list of pairs (id of the user, list of ids of his friends) for all users in a cache.
+        :return: list of tuple
+        """
+        with self._lock:
+            rows = self._connection.execute("SELECT user_id, friends_ids FROM friends ORDER BY user_id").fetchall()
+
+        return [(row[0], self._unpack(row[1])) for row in rows]
+
+    def clear(self):
+        """
+        Remove all users from a cache.
+        :return: NoneType
+        """
+        with self._lock:
+            self._connection.execute("DELETE FROM friends")
+            self._connection.commit()
+
+    def close(self):
+        """
+        Close the database file.
+        :return: NoneType
+        """
+        with self._lock:
+            self._connection.close()
+
+
+def migrate_text_cache(text_file_name, cache):
+    """
+    Copy all users from old text cache (see dict_from_file()) into a FriendsCache. Return number of
+    copied users. Nobody knows when they were got, so they are not fresh.
+    :param text_file_name: str
+    :param cache: FriendsCache
+    :return: int
+    """
+    users_dict = dict_from_file(text_file_name)
+    cache.set_many_friends(list(users_dict.items()), fetch_time=0)
+
+    return len(users_dict)
+
+
+# Cache shared by the whole program (it is opened when it is needed first time):
+_shared_cache = None
+
+
+def get_friends_cache(file_name="cache.db", text_file_name="cache.txt"):
+    """
+    Return cache of friends of the program. When the database file is created, users from old text cache
+    (if there is one) are copied into it. The same object is returned every time.
+    :param file_name: str
+    :param text_file_name: str
+    :return: FriendsCache
+    """
+    global _shared_cache
+    if _shared_cache is None:
+        is_new = not os.path.exists(file_name)
+        _shared_cache = FriendsCache(file_name)
+
+        if is_new and os.path.exists(text_file_name):
+            users_num = migrate_text_cache(text_file_name, _shared_cache)
+            print("{} users were copied from '{}' into '{}'.".format(users_num, text_file_name, file_name))
+
+    return _shared_cache
+
+
+def set_friends_cache(cache):
+    """
+    Change cache of friends of the program (for example, so friends of fake users are not mixed with
+    friends of real ones). If cache is None, cache.db is opened again when it is needed.
+    :param cache: FriendsCache or NoneType
+    :return: NoneType
+    """
+    # Checking argument:
+    if cache is not None and not isinstance(cache, FriendsCache):
+        raise ValueError("Cache of friends must be FriendsCache or None.")
+
+    global _shared_cache
+    if _shared_cache is not None and _shared_cache is not cache:
+        _shared_cache.close()
+    _shared_cache = cache
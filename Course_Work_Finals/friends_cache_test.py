@@ -0,0 +1,68 @@
+import os
+from array import array
+import sqlite3
+from friends_cache import *
+from rate_limit import *
+from user_tree_functions import *
+
+
+# Testing:
+
+print("Testing copying old text cache into a database:")
+if os.path.exists("cache_test.db"):
+    os.remove("cache_test.db")
+cache = FriendsCache("cache_test.db")
+users_num = migrate_text_cache("cache.txt", cache)
+users_dict = dict_from_file("cache.txt")
+print(users_num, len(cache))
+assert users_num == len(users_dict) == len(cache)
+assert dict(cache.items()) == users_dict
+
+print("Testing reading friends of one user:")
+id_num = list(users_dict.keys())[0]
+print(id_num, cache.get_friends(id_num)[:5], cache.get_friends(1))
+assert cache.get_friends(id_num) == users_dict[id_num] and cache.get_friends(1) is None
+assert id_num in cache and 1 not in cache
+
+print("Testing graph from cache:")
+graph_1, graph_2 = graph_from_cache(id_num, cache, 2), graph_from_dict(id_num, users_dict, 1)
+print(graph_1, graph_2)
+assert graph_1.users_of_level(1) == graph_2.users_of_level(1)
+
+print("Testing replacing and clearing:")
+cache.set_friends(1, [2, 3, 2 ** 40])
+print(cache.get_friends(1))
+assert cache.get_friends(1) == [2, 3, 2 ** 40]
+cache.clear()
+print(len(cache))
+assert len(cache) == 0
+
+cache.close()
+os.remove("cache_test.db")
+
+print("Testing freshness of information in a cache:")
+fake_clock = FakeClock(1000)
+cache = FriendsCache("cache_test.db", ttl=100, clock=fake_clock)
+cache.set_friends(1, [2, 3])
+migrate_text_cache("cache.txt", cache)
+print(cache.is_fresh(1), cache.is_fresh(id_num), cache.is_fresh(5))
+assert cache.is_fresh(1) and not cache.is_fresh(id_num) and not cache.is_fresh(5)
+fake_clock.sleep(101)
+print(cache.is_fresh(1), cache.get_fetch_time(1))
+assert not cache.is_fresh(1) and cache.get_fetch_time(1) == 1000
+cache.set_ttl(None)
+assert cache.is_fresh(1) and cache.is_fresh(id_num)
+cache.close()
+os.remove("cache_test.db")
+
+print("Testing opening a cache created before times were kept:")
+connection = sqlite3.connect("cache_test.db")
+connection.execute("CREATE TABLE friends (user_id INTEGER PRIMARY KEY, friends_ids BLOB NOT NULL)")
+connection.execute("INSERT INTO friends VALUES (?, ?)", (1, array("q", [2, 3]).tobytes()))
+connection.commit()
+connection.close()
+cache = FriendsCache("cache_test.db", ttl=100)
+print(cache.get_friends(1), cache.get_fetch_time(1))
+assert cache.get_friends(1) == [2, 3] and not cache.is_fresh(1)
+cache.close()
+os.remove("cache_test.db")
@@ -0,0 +1,177 @@
+import threading
+from collections import OrderedDict
+from rate_limit import Clock
+from profiler import profiler
+
+
+class GraphMemo:
+    """
+    Graphs of friends which were already built, by ids of their roots, depths of search and sources of
+    friends (for example, "cache" or "twitter"), so a graph of a user is built only once (for example,
+    'friends all x' and then 'friends mutual x y' use the same graph of x). Graphs which are older than
+    max_age seconds given when they are asked for are built again. It keeps no more than max_size graphs
+    (graphs used least recently are forgotten first). Things which are computed from a graph (for example,
+    layout of its image) are kept with it, see derived().
+    """
+    def __init__(self, max_size=8, clock=None):
+        """
+        Initialise GraphMemo by maximal number of graphs and clock which tells age of graphs.
+        :param max_size: int
+        :param clock: Clock or NoneType
+        """
+        if clock is None:
+            clock = Clock()
+
+        # Checking arguments:
+        if not isinstance(max_size, int) or max_size < 1:
+            raise ValueError("Maximal number of graphs must be int bigger than zero.")
+        if not isinstance(clock, Clock):
+            raise ValueError("Clock of graphs must be Clock.")
+
+        self._max_size = max_size
+        self._clock = clock
+        self._lock = threading.Lock()
+
+        # Lists [graph, dictionary of things computed from it by their names, time when it was built] by
+        # (id of root, depth, source):
+        self._graphs = OrderedDict()
+
+        # Keys of graphs by ids of graph objects:
+        self._keys = dict()
+
+    def _is_fresh(self, key, max_age):
+        """
+        Return True if graph with key is kept and is not older than max_age seconds (None if any age is
+        good).
+        :param key: tuple
+        :param max_age: int or float or NoneType
+        :return: bool
+        """
+        if key not in self._graphs:
+            return False
+
+        return max_age is None or self._clock.time() - self._graphs[key][2] <= max_age
+
+    def has(self, user_id, depth, source=None, max_age=None):
+        """
+        Return True if graph of friends of the user with user_id with given depth got from source is kept
+        and is not older than max_age seconds.
+        :param user_id: int
+        :param depth: int
+        :param source: str or NoneType
+        :param max_age: int or float or NoneType
+        :return: bool
+        """
+        with self._lock:
+            return self._is_fresh((user_id, depth, source), max_age)
+
+    def get(self, user_id, depth, source=None, max_age=None):
+        """
+        Return graph of friends of the user with user_id with given depth got from source, or None if it is
+        not kept or is older than max_age seconds (then it is forgotten).
+        :param user_id: int
+        :param depth: int
+        :param source: str or NoneType
+        :param max_age: int or float or NoneType
+        :return: FriendGraph or User or NoneType
+        """
+        key = (user_id, depth, source)
+
+        with self._lock:
+            if not self._is_fresh(key, max_age):
+                if key in self._graphs:
+                    del self._keys[id(self._graphs.pop(key)[0])]
+                profiler.count("graph_memo.misses")
+                return None
+
+            # Graph was used, so it is forgotten last:
+            profiler.count("graph_memo.hits")
+            self._graphs.move_to_end(key)
+            return self._graphs[key][0]
+
+    def add(self, user_id, depth, graph, source=None):
+        """
+        Keep graph of friends of the user with user_id with given depth got from source.
+        :param user_id: int
+        :param depth: int
+        :param graph: FriendGraph or User
+        :param source: str or NoneType
+        :return: NoneType
+        """
+        key = (user_id, depth, source)
+
+        with self._lock:
+            if key in self._graphs:
+                del self._keys[id(self._graphs[key][0])]
+
+            self._graphs[key] = [graph, dict(), self._clock.time()]
+            self._graphs.move_to_end(key)
+            self._keys[id(graph)] = key
+
+            # Forgetting graphs which were used least recently:
+            while len(self._graphs) > self._max_size:
+                old_graph = self._graphs.popitem(last=False)[1][0]
+                del self._keys[id(old_graph)]
+
+    def graph(self, user_id, depth, build_func, source=None, max_age=None):
+        """
+        Return graph of friends of the user with user_id with given depth got from source. If it is not
+        kept or is older than max_age seconds, it is built by build_func() and kept.
+        :param user_id: int
+        :param depth: int
+        :param build_func: function
+        :param source: str or NoneType
+        :param max_age: int or float or NoneType
+        :return: FriendGraph or User
+        """
+        graph = self.get(user_id, depth, source, max_age)
+
+        if graph is None:
+            graph = build_func()
+            self.add(user_id, depth, graph, source)
+
+        return graph
+
+    def derived(self, graph, name, func):
+        """
+        Return func(graph). If graph is kept, the result is computed only once and kept with it under
+        name (so it is forgotten together with the graph). The result must not be changed.
+        :param graph: FriendGraph or User
+        :param name: str or tuple
+        :param func: function
+        :return: object
+        """
+        with self._lock:
+            key = self._keys.get(id(graph))
+            if key is not None and name in self._graphs[key][1]:
+                profiler.count("graph_memo.derived_hits")
+                return self._graphs[key][1][name]
+
+        result = func(graph)
+
+        with self._lock:
+            # Graph may be forgotten while result was computed:
+            if key is not None and self._keys.get(id(graph)) == key:
+                self._graphs[key][1][name] = result
+
+        return result
+
+    def clear(self):
+        """
+        Forget all graphs (for example, when friends of users may be different now).
+        :return: NoneType
+        """
+        with self._lock:
+            self._graphs = OrderedDict()
+            self._keys = dict()
+
+    def __len__(self):
+        """
+        Return number of kept graphs.
+        :return: int
+        """
+        return len(self._graphs)
+
+
+# Graphs shared by the whole program:
+graph_memo = GraphMemo()
@@ -0,0 +1,62 @@
+from graph_memo import *
+from user_tree_functions import *
+from rate_limit import FakeClock
+
+
+# Testing:
+test_friends = {1: [2, 3], 2: [4], 3: [4, 5], 4: [], 5: [1]}
+test_builds = []
+
+
+def test_build(id_num, depth):
+    """
+    Build graph of friends and remember that it was built.
+    :param id_num: int
+    :param depth: int
+    :return: FriendGraph
+    """
+    test_builds.append((id_num, depth))
+    return graph_from_dict(id_num, test_friends, depth)
+
+
+print("Testing that graphs are built once per root and depth:")
+test_memo = GraphMemo(max_size=2)
+test_graph = test_memo.graph(1, 2, lambda: test_build(1, 2))
+assert test_memo.graph(1, 2, lambda: test_build(1, 2)) is test_graph
+test_memo.graph(1, 1, lambda: test_build(1, 1))
+print(test_builds)
+assert test_builds == [(1, 2), (1, 1)] and len(test_memo) == 2 and test_memo.has(1, 2)
+
+print("Testing that graphs used least recently are forgotten first:")
+test_memo.get(1, 2)
+test_memo.graph(3, 2, lambda: test_build(3, 2))
+assert test_memo.has(1, 2) and not test_memo.has(1, 1) and test_memo.get(1, 1) is None
+
+print("Testing things computed from graphs:")
+test_layouts = []
+test_layout = test_memo.derived(test_graph, "layout", lambda graph: test_layouts.append(graph) or len(graph))
+assert test_memo.derived(test_graph, "layout", lambda graph: test_layouts.append(graph)) == test_layout == 5
+assert len(test_layouts) == 1
+
+# Graphs which are not kept are computed every time:
+test_other = graph_from_dict(2, test_friends, 2)
+test_memo.derived(test_other, "layout", lambda graph: test_layouts.append(graph))
+test_memo.derived(test_other, "layout", lambda graph: test_layouts.append(graph))
+assert len(test_layouts) == 3
+
+test_memo.clear()
+assert len(test_memo) == 0 and test_memo.get(1, 2) is None
+
+print("Testing sources and age of graphs:")
+test_clock = FakeClock()
+test_memo = GraphMemo(clock=test_clock)
+test_builds = []
+test_memo.graph(1, 2, lambda: test_build(1, 2), "cache", 100)
+test_memo.graph(1, 2, lambda: test_build(1, 2), "twitter", 100)
+test_clock.sleep(50)
+assert test_memo.has(1, 2, "cache", 100) and not test_memo.has(1, 2, "cache", 10) and not test_memo.has(1, 2)
+test_clock.sleep(100)
+test_memo.graph(1, 2, lambda: test_build(1, 2), "cache", 100)
+test_memo.graph(1, 2, lambda: test_build(1, 2), "twitter", None)
+print(test_builds)
+assert test_builds == [(1, 2), (1, 2), (1, 2)]
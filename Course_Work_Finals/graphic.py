@@ -1,161 +1,413 @@
-import networkx as nx
+import os
+import math
+import threading
+import numpy as np
+import matplotlib
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from matplotlib.collections import LineCollection
+from concurrent.futures import ThreadPoolExecutor
 from user_trees import *
 from user_tree_functions import *
 from twitter_access_stuff import *
+from profiler import profiler, profiled
+from graph_memo import graph_memo
 
 
-def full_trees_draw(tree_1, tree_2, show=False, save=False, image_name=""):
+# If there are more users on an image, only names of roots (and numbers of collapsed users) are shown:
+MAX_LABELS = 200
+
+# Users who have more friends than that have only the biggest (MAX_FAN_OUT - 1) of them drawn, and the rest
+# are collapsed into one point:
+MAX_FAN_OUT = 50
+
+# Colours of points:
+ROOT_COLOUR = "red"
+USER_COLOUR = "tab:blue"
+MUTUAL_COLOUR = "orange"
+COLLAPSED_COLOUR = "gray"
+
+# Size of images in inches:
+FIGURE_SIZE = (12, 12)
+
+
+def tree_children(tree):
     """
-    Create graph with full trees tree_1 and tree_2. If show is True,
-    show graph. If save is True, save graph with image_name
-    :param tree_1: User
-    :param tree_2: User
-    :param save: bool
-    :param show: bool
-    :param image_name: str
-    :return: NoneType
+    Return dictionary of lists of ids of friends (first occurrences only) of all users of a tree or graph
+    of friends by their ids.
+    :param tree: User or FriendGraph
+    :return: dict
     """
-    api = authorise(consumer_key, consumer_secret, access_token, access_token_secret)
+    result_dict = dict((id_num, []) for id_num in tree_ids(tree))
+
+    for id_1, id_2 in tree_edges(tree):
+        result_dict[id_1].append(id_2)
 
-    graph = nx.Graph()
+    return result_dict
 
-    # Creating a dictionary with ids and names of the users:
-    all_users = tree_1.all_users() + [tree_1, tree_2] + tree_2.all_users()
-    all_ids = [user.get_id_num() for user in all_users]
 
-    id_names_dict = dict()
+def radial_layout(tree, center=(0.0, 0.0), max_fan_out=MAX_FAN_OUT):
+    """
+    Return positions of users of a tree or graph of friends on an image: the root is in the center, users
+    of each level are on a circle with radius equal to the level, and each user gets part of the circle
+    proportional to the number of leaves of his tree (so nothing has to be moved like in spring layout).
+    If a user has more than max_fan_out friends, only the biggest (max_fan_out - 1) of their trees are
+    placed, and the rest are collapsed into one point with key ("more", id of the user).
+    Return tuple (dictionary of positions (x, y) by keys of points, list of pairs of keys which are
+    connected, dictionary of numbers of collapsed users by keys of collapsed points).
+    :param tree: User or FriendGraph
+    :param center: tuple
+    :param max_fan_out: int
+    :return: tuple
+    """
+    # Checking input:
+    if not isinstance(max_fan_out, int) or max_fan_out < 2:
+        raise ValueError("Maximal number of friends drawn must be int bigger than one.")
+
+    children = tree_children(tree)
+    root_id = tree_ids(tree)[0]
+
+    # Users level by level:
+    order = [root_id]
+    for id_num in order:
+        order.extend(children[id_num])
+
+    # Number of users in the tree of each user:
+    sizes = dict()
+    for id_num in reversed(order):
+        sizes[id_num] = 1 + sum(sizes[child_id] for child_id in children[id_num])
+
+    # Collapsing big numbers of friends:
+    collapsed = dict()
+    shown_children = dict()
+    shown_order = [root_id]
+    for key in shown_order:
+        kids = children.get(key, []) if not isinstance(key, tuple) else []
+
+        if len(kids) > max_fan_out:
+            kids = sorted(kids, key=lambda id_num: sizes[id_num], reverse=True)
+            collapsed[("more", key)] = sum(sizes[id_num] for id_num in kids[max_fan_out - 1:])
+            kids = kids[:max_fan_out - 1] + [("more", key)]
+
+        shown_children[key] = kids
+        shown_order.extend(kids)
+
+    # Number of leaves of the tree of each point (its part of the circle depends on it):
+    weights = dict()
+    for key in reversed(shown_order):
+        weights[key] = max(1, sum(weights[child_key] for child_key in shown_children[key]))
+
+    # Placing points from the root:
+    positions = {root_id: center}
+    levels = {root_id: 0}
+    starts = {root_id: 0.0}
+    spans = {root_id: 2 * math.pi}
+    edges = []
+
+    for key in shown_order:
+        angle = starts[key]
+        for child_key in shown_children[key]:
+            span = spans[key] * weights[child_key] / weights[key]
+            levels[child_key] = levels[key] + 1
+            starts[child_key] = angle
+            spans[child_key] = span
+
+            middle = angle + span / 2
+            positions[child_key] = (center[0] + levels[child_key] * math.cos(middle),
+                                    center[1] + levels[child_key] * math.sin(middle))
+            edges.append((key, child_key))
+            angle += span
+
+    return positions, edges, collapsed
+
+
+def tree_layout(tree):
+    """
+    Return radial_layout() of a tree or graph of friends. If the graph is kept in graph_memo, its layout
+    is computed only once (so the same graph drawn by different instructions is not placed again).
+    :param tree: User or FriendGraph
+    :return: tuple
+    """
+    return graph_memo.derived(tree, ("radial_layout", MAX_FAN_OUT), radial_layout)
 
-    for id_num in all_ids:
-        user = get_user(api, id_num)
-        name = user.screen_name
-        id_names_dict[id_num] = name
 
-    # Now adding nodes to graph:
-    graph.add_nodes_from([id_names_dict[id_1] for id_1 in all_ids])
+def links_layout(list_of_links):
+    """
+    Return positions of users of links on an image: first user of the links is on the left, the last one
+    is on the right, and users between them are placed in columns by their places in links. Return tuple
+    (dictionary of positions (x, y) by ids, list of pairs of ids which are connected).
+    :param list_of_links: list of list
+    :return: tuple
+    """
+    if not list_of_links:
+        return dict(), []
 
-    # Adding edges:
-    for user in all_users:
-        user_name = id_names_dict[user.get_id_num()]
-        children = user.get_children()
-        for child in children:
-            child_name = id_names_dict[child.get_id_num()]
-            graph.add_edge(user_name, child_name)
+    first_id, last_id = list_of_links[0][0], list_of_links[0][-1]
+    last_column = max(len(link) for link in list_of_links) - 1
 
-    # Putting graph into plot:
-    nx.draw_networkx(graph)
+    # Column of each user is his first place in links:
+    columns = dict()
+    for link in list_of_links:
+        for i, id_num in enumerate(link):
+            if id_num not in columns or i < columns[id_num]:
+                columns[id_num] = i
+    columns[last_id] = last_column
 
-    # Showing graph:
-    if show:
-        plt.show()
+    # Users of each column are placed from top to bottom:
+    column_users = dict()
+    for id_num, column in columns.items():
+        column_users.setdefault(column, []).append(id_num)
 
-    # Saving graph:
-    if save:
-        plt.savefig(image_name)
+    positions = dict()
+    for column, ids_list in column_users.items():
+        for i, id_num in enumerate(ids_list):
+            positions[id_num] = (float(column), (len(ids_list) - 1) / 2 - i)
 
-    plt.close()
+    # Steps which links share are drawn only once:
+    edges = list(dict.fromkeys(tuple(sorted(edge)) for edge in trie_edges(links_trie(list_of_links))))
 
-    return None
+    return positions, edges
 
 
-def only_links(list_of_links, show=False, save=False, image_name=""):
+def _draw_points(figure, positions, edges, colours, labels, extra_edges=()):
     """
-    Same, but show only links on a graph. Each link is list with ids.
-    :param list_of_links: list of list
-    :param show: bool
-    :param save: bool
-    :param image_name: str
+    Draw points with given positions, colours and labels, and lines between them, on a figure. All
+    lines are drawn as one collection, and all points are drawn at once, so even tens of thousands of
+    them are drawn fast.
+    :param figure: matplotlib.figure.Figure
+    :param positions: dict
+    :param edges: list of tuple
+    :param colours: dict
+    :param labels: dict
+    :param extra_edges: list of tuple
     :return: NoneType
     """
-    api = authorise(consumer_key, consumer_secret, access_token, access_token_secret)
+    axes = figure.add_subplot()
 
-    graph = nx.Graph()
+    keys = list(positions)
+    points = np.array([positions[key] for key in keys], dtype=float).reshape(-1, 2)
 
-    # Create list of all ids:
-    all_ids = []
-    for link in list_of_links:
-        for id_num in link:
-            if id_num not in all_ids:
-                all_ids.append(id_num)
+    # Lines:
+    if edges:
+        segments = np.array([(positions[key_1], positions[key_2]) for key_1, key_2 in edges], dtype=float)
+        axes.add_collection(LineCollection(segments, colors="lightgray", linewidths=0.6, zorder=1))
+    if extra_edges:
+        segments = np.array([(positions[key_1], positions[key_2]) for key_1, key_2 in extra_edges], dtype=float)
+        axes.add_collection(LineCollection(segments, colors=MUTUAL_COLOUR, linewidths=0.6, linestyles="dashed",
+                                           alpha=0.5, zorder=1))
 
-    # Dictionary with ids and names:
-    id_names_dict = dict()
+    # Points (smaller when there are many of them):
+    size = max(2.0, 300 / math.sqrt(max(1, len(keys))))
+    axes.scatter(points[:, 0], points[:, 1], s=size, zorder=2,
+                 c=[colours.get(key, USER_COLOUR) for key in keys])
 
-    for id_num in all_ids:
-        user = get_user(api, id_num)
-        name = user.screen_name
-        id_names_dict[id_num] = name
+    # Names:
+    font_size = 8 if len(labels) <= 50 else 6
+    for key, text in labels.items():
+        axes.annotate(text, positions[key], fontsize=font_size, zorder=3, xytext=(3, 3),
+                      textcoords="offset points")
 
-    # Add nodes to graph:
-    graph.add_nodes_from([id_names_dict[id_1] for id_1 in all_ids])
+    axes.set_aspect("equal")
+    axes.autoscale_view()
+    axes.axis("off")
 
-    # Adding edges:
-    for link in list_of_links:
-        for i in range(len(link) - 1):
-            id_1, id_2 = link[i], link[i + 1]
-            name_1, name_2 = id_names_dict[id_1], id_names_dict[id_2]
-            graph.add_edge(name_1, name_2)
 
-    # Putting graph into plot:
-    nx.draw_networkx(graph)
+def _labels_of(user_ids, important_keys, collapsed, labels):
+    """
+    Return dictionary of labels of points by their keys. If labels is True, all users are labelled, if it
+    is False, nothing is, and if it is None, all users are labelled only if there are no more than
+    MAX_LABELS of them (otherwise only important ones, like roots, are). Users are labelled with their
+    screen names (they are got from Twitter only for labelled users), collapsed points are labelled with
+    numbers of users in them.
+    :param user_ids: dict
+    :param important_keys: list
+    :param collapsed: dict
+    :param labels: bool or NoneType
+    :return: dict
+    """
+    if labels is False:
+        return dict()
+    if labels is True or len(user_ids) <= MAX_LABELS:
+        labelled_keys = list(user_ids)
+    else:
+        labelled_keys = list(important_keys)
+
+    id_names_dict = get_screen_names(get_api(), [user_ids[key] for key in labelled_keys])
 
-    # Showing graph:
-    if show:
-        plt.show()
+    result_dict = dict((key, id_names_dict[user_ids[key]]) for key in labelled_keys)
+    result_dict.update((key, "+{}".format(number)) for key, number in collapsed.items())
+
+    return result_dict
+
+
+# Images are saved one by one in the background, so the console doesn't wait for them (the thread finishes
+# saving all images before the program exits):
+_image_saver = ThreadPoolExecutor(max_workers=1)
+_image_lock = threading.Lock()
+_last_image = None
+
+
+def _save_image(scene, image_name):
+    """
+    Draw scene (arguments of _draw_points() without a figure) on a new figure which is not shown (so it
+    works without a display) and save it with image_name. The image is written into a temporary file
+    first, so a half-written image is never seen under image_name.
+    :param scene: tuple
+    :param image_name: str
+    :return: NoneType
+    """
+    temp_name = image_name + ".part"
+
+    try:
+        with profiler.span("save_image"):
+            figure = Figure(figsize=FIGURE_SIZE)
+            _draw_points(figure, *scene)
+            figure.savefig(temp_name, format=os.path.splitext(image_name)[1][1:] or "png")
+            os.replace(temp_name, image_name)
+    except Exception as error:
+        print("Image '{}' could not be saved: {}".format(image_name, error))
+        if os.path.exists(temp_name):
+            os.remove(temp_name)
+
+
+def wait_for_images():
+    """
+    Wait until all images which are being saved are saved.
+    :return: NoneType
+    """
+    with _image_lock:
+        last_image = _last_image
+
+    if last_image is not None:
+        last_image.result()
+
+
+def _output(scene, show, save, image_name):
+    """
+    Save scene (arguments of _draw_points() without a figure) with image_name in the background if save
+    is True, and show it if show is True. Saving and showing use different figures, so they don't depend
+    on each other.
+    :param scene: tuple
+    :param show: bool
+    :param save: bool
+    :param image_name: str
+    :return: NoneType
+    """
+    global _last_image
 
     # Saving graph:
     if save:
-        plt.savefig(image_name)
+        with _image_lock:
+            _last_image = _image_saver.submit(_save_image, scene, image_name)
 
-    plt.close()
+    # Showing graph (it can't be shown without a display):
+    if show:
+        if matplotlib.get_backend().lower() == "agg":
+            print("Image can't be shown, because there is no display.")
+            return None
+
+        figure = plt.figure(figsize=FIGURE_SIZE)
+        _draw_points(figure, *scene)
+        plt.show()
+        plt.close(figure)
 
 
-def draw_all_friends(tree, show=False, save=False, image_name=""):
+@profiled("full_trees_draw")
+def full_trees_draw(tree_1, tree_2, show=False, save=False, image_name="", labels=None):
     """
-    Draw full tree.
-    :param show: bool
+    Create graph with full trees tree_1 and tree_2. If show is True,
+    show graph. If save is True, save graph with image_name in the
+    background (see wait_for_images()). Trees
+    are drawn next to each other, and mutual users of them are
+    connected. See _labels_of() for labels.
+    :param tree_1: User or FriendGraph
+    :param tree_2: User or FriendGraph
     :param save: bool
+    :param show: bool
     :param image_name: str
-    :param tree: User
+    :param labels: bool or NoneType
     :return: NoneType
     """
-    api = authorise(consumer_key, consumer_secret, access_token, access_token_secret)
+    # Each tree around its root (the second one is to the right of the first one):
+    positions_1, edges_1, collapsed_1 = tree_layout(tree_1)
+    positions_2, edges_2, collapsed_2 = tree_layout(tree_2)
+    shift = _radius(positions_1) + _radius(positions_2) + 1.0
 
-    graph = nx.Graph()
+    # Points of the second tree are marked, because the same users may be in both trees:
+    positions = dict(positions_1)
+    positions.update(((2, key), (x + shift, y)) for key, (x, y) in positions_2.items())
+    edges = edges_1 + [((2, key_1), (2, key_2)) for key_1, key_2 in edges_2]
+    collapsed = dict(collapsed_1)
+    collapsed.update(((2, key), number) for key, number in collapsed_2.items())
 
-    # Creating a dictionary with ids and names of the users:
-    all_users = tree.all_users() + [tree]
-    all_ids = [user.get_id_num() for user in all_users]
+    user_ids = dict((key, key) for key in positions_1 if key not in collapsed_1)
+    user_ids.update(((2, key), key) for key in positions_2 if key not in collapsed_2)
 
-    id_names_dict = dict()
+    # Mutual users are connected:
+    mutual_ids = [key for key in positions_1 if key not in collapsed_1 and key in positions_2]
+    mutual_edges = [(id_num, (2, id_num)) for id_num in mutual_ids]
 
-    for id_num in all_ids:
-        user = get_user(api, id_num)
-        name = user.screen_name
-        id_names_dict[id_num] = name
+    roots = [tree_ids(tree_1)[0], (2, tree_ids(tree_2)[0])]
+    colours = dict((key, COLLAPSED_COLOUR) for key in collapsed)
+    colours.update((key, MUTUAL_COLOUR) for edge in mutual_edges for key in edge)
+    colours.update((key, ROOT_COLOUR) for key in roots)
 
-    # Now adding nodes to graph:
-    graph.add_nodes_from([id_names_dict[id_1] for id_1 in all_ids])
+    labels_dict = _labels_of(user_ids, roots, collapsed, labels)
 
-    # Adding edges:
-    for user in all_users:
-        user_name = id_names_dict[user.get_id_num()]
-        children = user.get_children()
-        for child in children:
-            child_name = id_names_dict[child.get_id_num()]
-            graph.add_edge(user_name, child_name)
+    _output((positions, edges, colours, labels_dict, mutual_edges), show, save, image_name)
 
-    # Putting graph into plot:
-    nx.draw_networkx(graph)
+    return None
 
-    # Showing graph:
-    if show:
-        plt.show()
 
-    # Saving graph:
-    if save:
-        plt.savefig(image_name)
+def _radius(positions):
+    """
+    Return distance from the first point (root of a tree) to the farthest one.
+    :param positions: dict
+    :return: float
+    """
+    x_0, y_0 = next(iter(positions.values()))
+    return max(math.hypot(x - x_0, y - y_0) for x, y in positions.values())
+
+
+@profiled("only_links")
+def only_links(list_of_links, show=False, save=False, image_name="", labels=None):
+    """
+    Same, but show only links on a graph. Each link is list with ids.
+    :param list_of_links: list of list
+    :param show: bool
+    :param save: bool
+    :param image_name: str
+    :param labels: bool or NoneType
+    :return: NoneType
+    """
+    positions, edges = links_layout(list_of_links)
+
+    roots = [list_of_links[0][0], list_of_links[0][-1]] if list_of_links else []
+    colours = dict((key, ROOT_COLOUR) for key in roots)
+    labels_dict = _labels_of(dict((key, key) for key in positions), roots, dict(), labels)
+
+    _output((positions, edges, colours, labels_dict), show, save, image_name)
+
+
+@profiled("draw_all_friends")
+def draw_all_friends(tree, show=False, save=False, image_name="", labels=None):
+    """
+    Draw full tree.
+    :param show: bool
+    :param save: bool
+    :param image_name: str
+    :param tree: User or FriendGraph
+    :param labels: bool or NoneType
+    :return: NoneType
+    """
+    positions, edges, collapsed = tree_layout(tree)
+
+    root_id = tree_ids(tree)[0]
+    colours = dict((key, COLLAPSED_COLOUR) for key in collapsed)
+    colours[root_id] = ROOT_COLOUR
+    user_ids = dict((key, key) for key in positions if key not in collapsed)
+    labels_dict = _labels_of(user_ids, [root_id], collapsed, labels)
 
-    plt.close()
+    _output((positions, edges, colours, labels_dict), show, save, image_name)
 
     return None
@@ -0,0 +1,45 @@
+import os
+import math
+import matplotlib
+matplotlib.use("Agg")
+from graphic import *
+
+
+# Testing:
+test_friends = {1: [2, 3, 4], 2: [5, 6], 3: [7], 4: [], 5: [], 6: [], 7: [1]}
+
+print("Testing radial layout of a tree and a graph:")
+for test_tree in [tree_from_dict(1, test_friends, 2), graph_from_dict(1, test_friends, 2)]:
+    test_positions, test_edges, test_collapsed = radial_layout(test_tree)
+    print(test_positions)
+    assert sorted(test_positions) == [1, 2, 3, 4, 5, 6, 7] and test_collapsed == dict()
+    assert sorted(test_edges) == [(1, 2), (1, 3), (1, 4), (2, 5), (2, 6), (3, 7)]
+
+    # Users are on circles of their levels, and user 2 (with two leaves) gets half of the circle:
+    assert test_positions[1] == (0.0, 0.0)
+    for test_id, test_level in tree_depths(test_tree).items():
+        assert math.isclose(math.hypot(*test_positions[test_id]), test_level)
+    assert math.isclose(math.atan2(test_positions[2][1], test_positions[2][0]), math.pi / 2)
+
+print("Testing collapsing of users with many friends:")
+test_positions, test_edges, test_collapsed = radial_layout(graph_from_dict(1, test_friends, 2), max_fan_out=2)
+print(test_positions)
+assert test_collapsed == {("more", 1): 3}
+assert sorted(key for key in test_positions if not isinstance(key, tuple)) == [1, 2, 5, 6]
+
+print("Testing layout of links:")
+test_positions, test_edges = links_layout([[1, 2, 5, 9], [1, 3, 9], [1, 2, 6, 9]])
+print(test_positions)
+assert test_positions[1] == (0.0, 0.0) and test_positions[9] == (3.0, 0.0)
+assert test_positions[2][0] == test_positions[3][0] == 1.0 and test_positions[5][0] == 2.0
+assert len(test_edges) == 7
+
+print("Testing saving of images in the background:")
+for test_name in ["graphic_test.png", "graphic_test.svg"]:
+    draw_all_friends(graph_from_dict(1, test_friends, 2), True, True, test_name, labels=False)
+    wait_for_images()
+    assert os.path.exists(test_name) and not os.path.exists(test_name + ".part")
+    test_file = open(test_name, "rb")
+    assert test_file.read(5) in (b"\x89PNG\r", b"<?xml")
+    test_file.close()
+    os.remove(test_name)
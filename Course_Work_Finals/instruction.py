@@ -1,14 +1,27 @@
+import os
+import tweepy
 from settings import *
 from user_trees import *
 from user_tree_functions import *
 from twitter_access_stuff import *
 from graphic import *
+from friends_cache import *
+from crawl_checkpoint import CrawlCheckpoint
+from fake_twitter import FakeTwitterAPI, generate_power_law_graph
+from rate_limit import RateLimitScheduler, FakeClock
+from name_cache import NameCache
+from profiler import profiler
+from graph_memo import graph_memo
+from itertools import islice
 
 
 class Instruction:
     """
     Class representing instructions.
     """
+    # Name of JSON file into which profile of each instruction is written (None if it isn't written):
+    _profile_file = None
+
     def __init__(self):
         """
         Initialise an instance of Instruction class. Arguments are not needed.
@@ -30,6 +43,33 @@ class Instruction:
         # Splitting argument:
         args = args_str.split()
 
+        # Measuring the instruction if profiling is on:
+        try:
+            if not profiler.enabled or not args or args[0] == "profile":
+                Instruction._run_instruction(args, settings)
+                return None
+
+            profiler.reset()
+            try:
+                with profiler.span("instruction"):
+                    Instruction._run_instruction(args, settings)
+            finally:
+                Instruction._print_profile()
+
+        # Searches save their checkpoints before errors get here:
+        except tweepy.error.TweepError as error:
+            print("Request to Twitter failed: {}".format(error))
+            if CrawlCheckpoint("crawl_checkpoint.txt").exists():
+                print("Type 'resume' to continue the search.")
+
+    @staticmethod
+    def _run_instruction(args, settings):
+        """
+        Run instruction for a list of words.
+        :param args: list of str
+        :param settings: Settings
+        :return: NoneType
+        """
         # Checking which instruction to run:
         # For settings:
         if len(args) < 1:
@@ -89,17 +129,20 @@ class Instruction:
                 if args[1] == "show":
                     Instruction._print_cache_file()
                 elif args[1] == "clear":
-                    file = open("cache.txt", "w")
-                    file.write("")
-                    file.close()
+                    get_friends_cache().clear()
+                    graph_memo.clear()
                 elif args[1] == "help":
                     Instruction._print_cache_help()
+                elif args[1] == "migrate":
+                    Instruction._migrate_cache("cache.txt")
                 else:
                     print("Incorrect instruction.")
             else:
                 if args[1] == "add":
                     users = args[2:]
                     Instruction._cache_users(settings, users)
+                elif args[1] == "migrate" and len(args) == 3:
+                    Instruction._migrate_cache(args[2])
                 else:
                     print("Incorrect instructions")
 
@@ -113,6 +156,32 @@ class Instruction:
             else:
                 print("Incorrect input.")
 
+        elif args[0] == "backend":
+            if len(args) == 2 and args[1] == "twitter":
+                Instruction._use_twitter()
+            elif len(args) in (3, 4) and args[1] == "fake" and False not in [arg.isdigit() for arg in args[2:]]:
+                latency = int(args[3]) if len(args) == 4 else 0
+                Instruction._use_fake_twitter(int(args[2]), latency)
+            else:
+                print("Incorrect input.")
+
+        elif args[0] == "profile":
+            if len(args) == 2 and args[1] == "on":
+                Instruction._profile_on(None)
+            elif len(args) == 3 and args[1] == "on":
+                Instruction._profile_on(args[2])
+            elif len(args) == 2 and args[1] == "off":
+                profiler.disable()
+                print("Profiling is off.")
+            else:
+                print("Incorrect input.")
+
+        elif len(args) == 1 and args[0] == "resume":
+            Instruction._resume(settings)
+
+        elif len(args) == 2 and args[0] == "resume" and args[1] == "cancel":
+            Instruction._cancel_resume()
+
         elif len(args) == 1 and args[0] == "info":
             print("Program for finding mutual friends created by Mykola Stefaniv as coursework.")
 
@@ -272,6 +341,14 @@ class Instruction:
         print("Type 'info' to get information about the program.")
         print("Type 'friends all <person_name>' to show all Twitter friends of a person.")
         print("Type 'friends mutual <person_1> <person_2>' to show if two people have mutual friends on Twitter.")
+        print("Type 'resume' to continue the last search which was stopped (with the same depth).")
+        print("Type 'resume cancel' to forget the last search which was stopped.")
+        print("Type 'backend fake <users_number>' or 'backend fake <users_number> <latency_ms>' to use fake "
+              "Twitter with generated users (user_0, user_1, ...) instead of the real one. Twitter limits work "
+              "there too, but waiting takes no time. Fake users have their own cache.")
+        print("Type 'backend twitter' to use the real Twitter again.")
+        print("Type 'profile on' to print how much time each part of the program takes after each instruction, "
+              "or 'profile on <file_name>.json' to write it into a file too. Type 'profile off' to stop it.")
 
     @staticmethod
     def _print_cache_help():
@@ -279,16 +356,24 @@ class Instruction:
         Print information about caching.
         :return: NoneType
         """
-        print("Cache is a text file in which information about users and their friends may be stored.")
+        print("Cache is a database file (cache.db) in which information about users and their friends may be "
+              "stored.")
         print("This is useful because search information takes some time sometimes.")
-        print("Whether the program uses cache or not is specified in the settings.")
+        print("Whether the program uses cache or not is specified in the settings. When it is used, users who are "
+              "not in the cache are searched on Twitter and added to it.")
         print("Type 'cache show' to show cache.")
         print("Type 'cache help' to show this information.")
-        print("Type 'cache clear' to clear the cache (if you add something to cache, old information remains there).")
+        print("Type 'cache clear' to clear the cache (adding a user who is already there replaces his old "
+              "information).")
+        print("Type 'cache migrate' or 'cache migrate <file_name>' to copy information from old text cache "
+              "(cache.txt by default) into the cache.")
         print("Type 'cache add <user_1> to add information about the user and friends of his friends to the cache."
               "Depth of search is specified in settings.")
         print("Type 'cache add <user_1> <user_2> ... <user_n> to add multiple users and friends of their friends to "
               "cache.")
+        print("Users who are already in the cache are not searched again, so if 'cache add' was interrupted, "
+              "just type it again to continue.")
+        print("Information older than 'cache_ttl' hours is still used, but it is refreshed in the background.")
 
     @staticmethod
     def _print_cache_file():
@@ -296,9 +381,44 @@ class Instruction:
         Print information about cache file.
         :return: NoneType
         """
-        cache_dict = dict_from_file("cache.txt")
-        for key in cache_dict:
-            print("{}: {}".format(key, cache_dict[key]))
+        for id_num, friends_ids in get_friends_cache().items():
+            print("{}: {}".format(id_num, friends_ids))
+
+    @staticmethod
+    def _get_cache(settings):
+        """
+        Return cache of friends with time to live from settings.
+        :param settings: Settings
+        :return: FriendsCache
+        """
+        ttl = settings.setting_by_name("cache_ttl").get_current_value()
+
+        cache = get_friends_cache()
+        if ttl == "inf":
+            cache.set_ttl(None)
+        else:
+            cache.set_ttl(int(ttl) * 60 * 60)
+
+        return cache
+
+    @staticmethod
+    def _migrate_cache(file_name):
+        """
+        Copy information from old text cache file into the cache.
+        :param file_name: str
+        :return: NoneType
+        """
+        if not file_name.endswith(".txt"):
+            print("Old cache can only be *.txt file.")
+            return None
+
+        try:
+            users_num = migrate_text_cache(file_name, get_friends_cache())
+        except (OSError, ValueError):
+            print("Couldn't read old cache from '{}'.".format(file_name))
+            return None
+
+        print("{} users were copied into the cache.".format(users_num))
 
     @staticmethod
     def _cache_users(settings, names_list):
@@ -310,31 +430,217 @@ class Instruction:
         # Extracting setting:
         depth_setting = settings.setting_by_name("search_depth")
         depth = int(depth_setting.get_current_value())
+        workers = int(settings.setting_by_name("crawl_workers").get_current_value())
 
-        result_str = ""
+        api = get_api()
+        cache = Instruction._get_cache(settings)
 
         for name in names_list:
-            api = authorise(consumer_key, consumer_secret, access_token, access_token_secret)
             user = get_user(api, name)
             id_num = user.id
-            tree = build_friend_tree(api, id_num, depth)
-            tree_str = tree.in_file_tree()
-            result_str = result_str + tree_str
 
-        # Into file:
-        file = open("cache.txt", "a")
-        file.write(result_str)
-        file.close()
+            # Friends of each user are written into cache as soon as they are found, and users who are
+            # already there are skipped:
+            build_friend_graph(api, id_num, depth, workers, cache)
+            print("Successfully cached {}.".format(name))
+
+    @staticmethod
+    def _profile_on(file_name):
+        """
+        Turn profiling on: after each instruction, time spent in different parts of the program and
+        counters of events are printed (and written into JSON file file_name, if it isn't None).
+        :param file_name: str or NoneType
+        :return: NoneType
+        """
+        if file_name is not None and not file_name.endswith(".json"):
+            print("Profile can only be written into *.json file.")
+            return None
+
+        Instruction._profile_file = file_name
+        profiler.enable()
+        print("Profiling is on.")
+
+    @staticmethod
+    def _print_profile():
+        """
+        Print profile of the last instruction (and write it into the file, if it is set).
+        :return: NoneType
+        """
+        print("Profile of the instruction:")
+        print(profiler.report())
+
+        if Instruction._profile_file is not None:
+            profiler.dump(Instruction._profile_file)
+            print("Profile was written into '{}'.".format(Instruction._profile_file))
+
+    @staticmethod
+    def _use_fake_twitter(users_num, latency):
+        """
+        Make the program use fake Twitter with users_num generated users instead of the real one. Each
+        request takes latency milliseconds.
+        :param users_num: int
+        :param latency: int
+        :return: NoneType
+        """
+        if users_num < 2:
+            print("There must be at least 2 users.")
+            return None
+
+        print("Generating users...")
+        friends_dict = generate_power_law_graph(users_num, min(10, users_num - 1), seed=0)
+
+        # Waiting for the end of windows takes no time:
+        clock = FakeClock()
+        set_request_scheduler(RateLimitScheduler(clock=clock))
+        set_api(FakeTwitterAPI(friends_dict, latency / 1000, RateLimitScheduler.DEFAULT_LIMITS, clock))
+        set_name_cache(NameCache("fake_names_cache.txt"))
+
+        # Friends of fake users are kept apart from friends of real ones (and they are different each time):
+        fake_cache = FriendsCache("fake_cache.db")
+        fake_cache.clear()
+        set_friends_cache(fake_cache)
+        graph_memo.clear()
+
+        print("Fake Twitter with {} users is used (their names are user_0, user_1, ...).".format(users_num))
+
+    @staticmethod
+    def _use_twitter():
+        """
+        Make the program use the real Twitter again.
+        :return: NoneType
+        """
+        cache = NameCache("names_cache.txt")
+        cache.load()
+
+        set_request_scheduler(RateLimitScheduler())
+        set_api(None)
+        set_name_cache(cache)
+        set_friends_cache(None)
+        graph_memo.clear()
+
+        print("Real Twitter is used.")
+
+    @staticmethod
+    def _graph_source(settings):
+        """
+        Return source of friends set in settings ("cache" or "twitter") and how many seconds graphs of
+        friends stay fresh (None if they always do), so graphs built with other settings are not used.
+        :param settings: Settings
+        :return: tuple
+        """
+        use_cache = settings.setting_by_name("use_cache").get_current_value()
+        ttl = settings.setting_by_name("cache_ttl").get_current_value()
+
+        source = "cache" if use_cache == "True" else "twitter"
+        max_age = None if ttl == "inf" else int(ttl) * 60 * 60
+
+        return source, max_age
+
+    @staticmethod
+    def _new_checkpoint(settings):
+        """
+        Return checkpoint for a new search. It is started by _start_checkpoint() only when friends are
+        really searched.
+        :param settings: Settings
+        :return: CrawlCheckpoint
+        """
+        interval = int(settings.setting_by_name("checkpoint_every").get_current_value())
+
+        return CrawlCheckpoint("crawl_checkpoint.txt", interval)
+
+    @staticmethod
+    def _start_checkpoint(checkpoint, command, depth):
+        """
+        Start checkpoint of a search started by command, so it can be continued if it stops. If the search
+        is continued from the checkpoint, nothing is done. Checkpoint of another stopped search is not
+        replaced (the new search is not saved then).
+        :param checkpoint: CrawlCheckpoint
+        :param command: str
+        :param depth: int
+        :return: NoneType
+        """
+        if checkpoint.get_command() is not None:
+            return None
+
+        if checkpoint.exists():
+            print("This search won't be saved, because there is a stopped search which can be continued. "
+                  "Type 'resume' to continue it or 'resume cancel' to forget it.")
+            return None
+
+        checkpoint.start(command, depth)
+
+    @staticmethod
+    def _finish_checkpoint(checkpoint):
+        """
+        Remove checkpoint of a search which has finished (if the search was saved into it).
+        :param checkpoint: CrawlCheckpoint
+        :return: NoneType
+        """
+        if checkpoint.get_command() is not None:
+            checkpoint.remove()
+
+    @staticmethod
+    def _search_stopped(checkpoint):
+        """
+        Save checkpoint of a search which was stopped by the user and tell him how to continue it.
+        :param checkpoint: CrawlCheckpoint
+        :return: NoneType
+        """
+        checkpoint.save()
+        if checkpoint.get_command() is not None:
+            print("Search was stopped. Type 'resume' to continue it.")
+        else:
+            print("Search was stopped.")
+
+    @staticmethod
+    def _cancel_resume():
+        """
+        Forget the last search which was stopped.
+        :return: NoneType
+        """
+        if not os.path.exists("crawl_checkpoint.txt"):
+            print("There is no stopped search.")
+            return None
+
+        os.remove("crawl_checkpoint.txt")
+        print("Stopped search was forgotten.")
 
     @staticmethod
-    def _friends_all(settings, person_name):
+    def _resume(settings):
         """
-        Return list of names of all friends of a person with depth specified in settings.
+        Continue the last search which was stopped from its checkpoint.
+        :param settings: Settings
+        :return: NoneType
+        """
+        interval = int(settings.setting_by_name("checkpoint_every").get_current_value())
+        checkpoint = CrawlCheckpoint("crawl_checkpoint.txt", interval)
+
+        if not checkpoint.load():
+            print("There is no stopped search to continue.")
+            return None
+
+        print("Continuing '{}' (friends of {} users were already got).".format(checkpoint.get_command(),
+                                                                               len(checkpoint.get_friends())))
+        args = checkpoint.get_command().split()
+
+        if len(args) == 3 and args[:2] == ["friends", "all"]:
+            Instruction._friends_all(settings, args[2], checkpoint)
+        elif len(args) == 4 and args[:2] == ["friends", "mutual"]:
+            Instruction._mutual_friends(settings, args[2], args[3], checkpoint)
+        else:
+            print("Checkpoint of the search is corrupted.")
+
+    @staticmethod
+    def _friends_all(settings, person_name, checkpoint=None):
+        """
+        Return list of names of all friends of a person with depth specified in settings. If checkpoint of
+        a stopped search is given, the search is continued with its depth.
         :param settings: str
         :param person_name: str
+        :param checkpoint: CrawlCheckpoint or NoneType
         :return: list
         """
-        api = authorise(consumer_key, consumer_secret, access_token, access_token_secret)
+        api = get_api()
 
         user_1 = get_user(api, person_name)
         id_1 = user_1.id
@@ -353,6 +659,7 @@ class Instruction:
         show = setting_value("show_image")
         use_cache = setting_value("use_cache")
         depth = int(setting_value("search_depth"))
+        workers = int(setting_value("crawl_workers"))
 
         if show == "True":
             show = True
@@ -364,37 +671,69 @@ class Instruction:
         else:
             save = False
 
-        # First of all, creating tree:
-        if use_cache == "True":
-            dict_of_friends = dict_from_file("cache.txt")
-
-            # Checking for error:
-            if id_1 not in dict_of_friends.keys():
-                print("Sorry, but the program couldn't find one of the users in cache.")
-                return None
+        # Search can be continued later if it stops:
+        if checkpoint is None:
+            checkpoint = Instruction._new_checkpoint(settings)
+        else:
+            depth = checkpoint.get_depth()
 
-            # Tree:
-            tree_1 = tree_from_dict(id_1, dict_of_friends, depth)
+        # First of all, creating tree (if cache is used, only friends which are not in cache are got from
+        # Twitter, and they are added to cache):
+        if use_cache == "True":
+            cache = Instruction._get_cache(settings)
+            crawler = FrontierCrawler(lambda id_num: get_cached_friends_ids(api, cache, id_num), workers,
+                                      checkpoint)
 
         # If we don't have to use cache:
         else:
-            tree_1 = build_friend_tree(api, id_1, depth)
+            crawler = FrontierCrawler(lambda id_num: get_friends_ids(api, id_num), workers, checkpoint)
+
+        # Graph of the user is built only if no previous instruction has built it:
+        source, max_age = Instruction._graph_source(settings)
+        if not graph_memo.has(id_1, depth, source, max_age):
+            Instruction._start_checkpoint(checkpoint, "friends all {}".format(person_name), depth)
+
+        try:
+            tree_1 = graph_memo.graph(id_1, depth, lambda: crawler.crawl(id_1, depth), source, max_age)
+        except KeyboardInterrupt:
+            Instruction._search_stopped(checkpoint)
+            return None
+        except Exception:
+            checkpoint.save()
+            raise
 
+        Instruction._finish_checkpoint(checkpoint)
         print("Successfully found friends.")
+        Instruction._print_fetch_counts(crawler)
 
         # Now drawing tree:
         if show or save:
             draw_all_friends(tree_1, show, save, image_name)
 
     @staticmethod
-    def _mutual_friends(settings, person_1, person_2):
+    def _print_fetch_counts(crawler):
+        """
+        Print numbers of users whose friends were got on each level of search.
+        :param crawler: FrontierCrawler
+        :return: NoneType
+        """
+        if crawler.get_fetch_counts():
+            print("Friends of {} users were got (by levels: {}).".format(
+                crawler.fetches_num(), ", ".join(str(count) for count in crawler.get_fetch_counts())))
+        else:
+            print("Friends of {} users were got.".format(crawler.fetches_num()))
+
+    @staticmethod
+    def _mutual_friends(settings, person_1, person_2, checkpoint=None):
         """
-        Search for mutual friends depending on settings.
+        Search for mutual friends depending on settings. If checkpoint of a stopped search is given, the
+        search is continued with its depth.
         :param settings: Settings
         :param person_1, person_2: str
+        :param checkpoint: CrawlCheckpoint or NoneType
         :return: list of str
         """
-        api = authorise(consumer_key, consumer_secret, access_token, access_token_secret)
+        api = get_api()
 
         user_1 = get_user(api, person_1)
         user_2 = get_user(api, person_2)
@@ -417,6 +756,7 @@ class Instruction:
         full_trees = setting_value("show_full_trees")
         use_cache = setting_value("use_cache")
         depth = int(setting_value("search_depth"))
+        workers = int(setting_value("crawl_workers"))
         max_links_num = setting_value("max_links_shown")
 
         if show == "True":
@@ -429,50 +769,86 @@ class Instruction:
         else:
             save = False
 
-        # First of all, creating trees:
+        # Search can be continued later if it stops:
+        if checkpoint is None:
+            checkpoint = Instruction._new_checkpoint(settings)
+        else:
+            depth = checkpoint.get_depth()
+
+        # Source of friends of users (if cache is used, only friends which are not in cache are got from
+        # Twitter, and they are added to cache):
         if use_cache == "True":
-            dict_of_friends = dict_from_file("cache.txt")
+            cache = Instruction._get_cache(settings)
+        else:
+            cache = None
 
-            # Checking for error:
-            if id_1 not in dict_of_friends.keys() or id_2 not in dict_of_friends.keys():
-                print("Sorry, but the program couldn't find one of the users in cache.")
-                return None
+        def friends_func(id_num):
+            """
+            Return ids of friends of the user.
+            :param id_num: int
+            :return: list of int
+            """
+            if cache is None:
+                return get_friends_ids(api, id_num)
+            return get_cached_friends_ids(api, cache, id_num)
 
-            # Trees:
-            tree_1 = tree_from_dict(id_1, dict_of_friends, depth)
-            tree_2 = tree_from_dict(id_2, dict_of_friends, depth)
+        # Friends of users who are in both graphs are got only once:
+        crawler = FrontierCrawler(friends_func, workers, checkpoint)
 
-        # If we don't have to use cache:
-        else:
-            tree_1 = build_friend_tree(api, id_1, depth)
-            tree_2 = build_friend_tree(api, id_2, depth)
+        def tree_func(id_num):
+            """
+            Return graph of friends of the user (it is built only if no previous instruction has built it).
+            :param id_num: int
+            :return: FriendGraph
+            """
+            return graph_memo.graph(id_num, depth, lambda: crawler.crawl(id_num, depth), source, max_age)
+
+        # Full trees are built only if they are needed:
+        tree_1, tree_2 = None, None
+
+        # Friends are searched only if no previous instruction has built both graphs:
+        source, max_age = Instruction._graph_source(settings)
+        both_kept = graph_memo.has(id_1, depth, source, max_age) and graph_memo.has(id_2, depth, source, max_age)
+        if not both_kept:
+            Instruction._start_checkpoint(checkpoint, "friends mutual {} {}".format(person_1, person_2), depth)
 
         # Now finding mutual friends between people:
-        # Finding mutual users in trees:
-        mutual_ids = find_mutual_ids(tree_1, tree_2)
+        try:
+            if one_link == "True" and not both_kept:
+                # Only the shortest link is needed, so searching from both users at the same time:
+                list_of_links = bidirectional_search(crawler.friends_of, id_1, id_2, depth, workers)[:1]
+            else:
+                tree_1, tree_2 = tree_func(id_1), tree_func(id_2)
+
+                # Getting links from the shortest one (only as many as will be shown):
+                links_iter = iter_shortest_links(tree_1, tree_2)
+                if one_link == "True":
+                    list_of_links = list(islice(links_iter, 1))
+                elif max_links_num == "inf":
+                    list_of_links = list(links_iter)
+                else:
+                    list_of_links = list(islice(links_iter, int(max_links_num)))
+
+            # Full trees are built now if they will be drawn, so the search is saved while they are built:
+            if full_trees == "True" and (show or save) and tree_1 is None:
+                tree_1, tree_2 = tree_func(id_1), tree_func(id_2)
+        except KeyboardInterrupt:
+            Instruction._search_stopped(checkpoint)
+            return None
+        except Exception:
+            checkpoint.save()
+            raise
+
+        Instruction._finish_checkpoint(checkpoint)
 
-        # Getting all links:
-        list_of_links = []
-        for id_num in mutual_ids:
-            link = link_to_list(id_num, tree_1, tree_2)
-            list_of_links.append(link)
+        if crawler.fetches_num():
+            Instruction._print_fetch_counts(crawler)
 
         # Printing results on the screen:
         if list_of_links:
             print("There are mutual friends between two users. Link(s):")
-            # Settings that limit number of links shown:
-            if max_links_num == "inf":
-                links_num = len(list_of_links)
-            else:
-                links_num = int(max_links_num)
-
-            if one_link == "True":
-                min_id = find_min_link(mutual_ids, tree_1, tree_2)
-                link = link_to_list(min_id, tree_1, tree_2)
+            for link in list_of_links:
                 print(link_to_string(link))
-            else:
-                for link in list_of_links[:links_num]:
-                    print(link_to_string(link))
         else:
             print("There are no mutual friends between two users.")
 
@@ -485,11 +861,5 @@ class Instruction:
             full_trees_draw(tree_1, tree_2, show, save, image_name)
 
         else:
-            if one_link == "True":
-                # Showing only one link - the shortest one:
-                best_id = find_min_link(mutual_ids, tree_1, tree_2)
-                link = link_to_list(best_id, tree_1, tree_2)
-                only_links([link], show, save, image_name)
-            else:
-                # Showing all links:
-                only_links(list_of_links, show, save, image_name)
+            # Showing link(s) (if one_link is True, there is only the shortest one):
+            only_links(list_of_links, show, save, image_name)
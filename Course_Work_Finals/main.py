@@ -7,11 +7,11 @@ from instruction import Instruction
 # Helper function:
 def is_image(image_str):
     """
-    Return True if image_str is *.png image. Return False otherwise.
+    Return True if image_str is *.png or *.svg image. Return False otherwise.
     :param image_str: str
     :return: bool
     """
-    if not image_str.endswith(".png"):
+    if not image_str.endswith(".png") and not image_str.endswith(".svg"):
         return False
 
     # If False was not returned:
@@ -37,8 +37,28 @@ def is_max_link_num(num_str):
             return False
 
 
+def is_cache_ttl(num_str):
+    """
+    Return True if num_str can represent how many hours information in cache stays fresh (str(int) or 'inf').
+    :param num_str: str
+    :return: bool
+    """
+    # Same values as for maximum number of links:
+    return is_max_link_num(num_str)
 
-image_name = Setting("image_name", is_image, "friends_connections.png", "Name of saved image", "[*.png]")
+
+def is_checkpoint_every(num_str):
+    """
+    Return True if num_str can represent number of users after which checkpoint of a search is saved
+    (str(int) bigger than zero).
+    :param num_str: str
+    :return: bool
+    """
+    return num_str.isdigit() and int(num_str) > 0
+
+
+
+image_name = Setting("image_name", is_image, "friends_connections.png", "Name of saved image", "[*.png or *.svg]")
 search_depth = Setting("search_depth", [str(i) for i in range(1, 10)], "2", "How many mutual friends does the"
                                                                             " program have to check by default.",
                        "['1', '2', ..., '9']")
@@ -49,15 +69,30 @@ find_one_link = Setting("find_one_link", ["True", "False"], "True", "If True, pr
                                                                     "Otherwise it will show all links.")
 show_full_trees = Setting("show_full_trees", ["True", "False"], "True", "Whether the image must show full trees "
                                                                         "or only link(s) between users.")
-use_cache = Setting("use_cache", ["True", "False"], "False", "Whether the program should use cache.")
+use_cache = Setting("use_cache", ["True", "False"], "False", "Whether the program should use cache (friends "
+                                                              "which are not in cache are got from Twitter and "
+                                                              "added to it).")
 
 max_links_shown = Setting("max_links_shown", is_max_link_num, "inf", "How much links to print on screen after "
                                                                      "finding mutual friends.", "[str(int: int >= 0) or"
                                                                                                 " 'inf']")
 
+cache_ttl = Setting("cache_ttl", is_cache_ttl, "168", "How many hours information about friends in cache stays "
+                                                     "fresh (older information is used, but refreshed).",
+                    "[str(int: int >= 0) or 'inf']")
+
+crawl_workers = Setting("crawl_workers", [str(i) for i in range(1, 17)], "4", "How many users can the program get "
+                                                                             "friends of at the same time.",
+                        "['1', '2', ..., '16']")
+
+checkpoint_every = Setting("checkpoint_every", is_checkpoint_every, "50", "After how many users the program saves "
+                                                                        "search, so it can be continued with "
+                                                                        "'resume' if it stops.",
+                           "[str(int: int > 0)]")
+
 # Creating panel of those settings:
 settings_panel = Settings([search_depth, image_name, save_image, show_image, find_one_link, show_full_trees,
-                           use_cache, max_links_shown])
+                           use_cache, max_links_shown, crawl_workers, cache_ttl, checkpoint_every])
 
 # Save default settings:
 settings_panel.write_into_file("default_settings.txt")
@@ -0,0 +1,102 @@
+import os
+import threading
+from collections import OrderedDict
+
+
+class NameCache:
+    """
+    Cache of screen names of Twitter users by their ids. It keeps no more than max_size names (names which
+    were used least recently are removed first) and can be saved into a text file, so names are not
+    requested from Twitter again next time the program runs.
+    """
+    def __init__(self, file_name, max_size=100000):
+        """
+        Initialise NameCache by name of its file and maximal number of names.
+        :param file_name: str
+        :param max_size: int
+        """
+        # Checking arguments:
+        if not isinstance(file_name, str) or not file_name.endswith(".txt"):
+            raise ValueError("Name of the file must be str, and have .txt extension.")
+        if not isinstance(max_size, int) or max_size < 1:
+            raise ValueError("Maximal size of a cache must be int bigger than zero.")
+
+        self._file_name = file_name
+        self._max_size = max_size
+        self._names = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, id_num):
+        """
+        Return screen name of the user with id_num or None if it is not in a cache.
+        :param id_num: int
+        :return: str or NoneType
+        """
+        with self._lock:
+            if id_num not in self._names:
+                return None
+
+            # Name was used, so it is removed last:
+            self._names.move_to_end(id_num)
+            return self._names[id_num]
+
+    def set(self, id_num, name):
+        """
+        Add screen name of the user with id_num to a cache.
+        :param id_num: int
+        :param name: str
+        :return: NoneType
+        """
+        with self._lock:
+            self._names[id_num] = name
+            self._names.move_to_end(id_num)
+
+            # Removing names which were used least recently:
+            while len(self._names) > self._max_size:
+                self._names.popitem(last=False)
+
+    def __contains__(self, id_num):
+        """
+        Return True if screen name of the user with id_num is in a cache.
+        :param id_num: int
+        :return: bool
+        """
+        return id_num in self._names
+
+    def __len__(self):
+        """
+        Return number of names in a cache.
+        :return: int
+        """
+        return len(self._names)
+
+    def load(self):
+        """
+        Read names from the file of a cache (if it exists). Each line of the file looks like this:
+        <id> <screen_name>
+        (names used least recently go first). Corrupted lines are ignored.
+        :return: NoneType
+        """
+        if not os.path.exists(self._file_name):
+            return None
+
+        file = open(self._file_name, "r")
+        lines = file.readlines()
+        file.close()
+
+        for line in lines:
+            words = line.split()
+            if len(words) == 2 and words[0].isdigit():
+                self.set(int(words[0]), words[1])
+
+    def save(self):
+        """
+        Write all names into the file of a cache (or rewrite it).
+        :return: NoneType
+        """
+        with self._lock:
+            lines = ["{} {}\n".format(id_num, name) for id_num, name in self._names.items()]
+
+        file = open(self._file_name, "w")
+        file.write("".join(lines))
+        file.close()
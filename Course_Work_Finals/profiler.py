@@ -0,0 +1,155 @@
+import time
+import json
+import threading
+from functools import wraps
+from contextlib import contextmanager
+
+
+class Profiler:
+    """
+    Profiler which measures how much time is spent in different parts of the program (spans) and counts
+    events (for example, requests to Twitter or users found in cache). It does nothing while it is
+    disabled, so it can stay in the program all the time. Time of spans which run in many threads at the
+    same time is summed, so it can be bigger than time of the whole instruction.
+    """
+    def __init__(self):
+        """
+        Initialise disabled Profiler. Arguments are not needed.
+        """
+        self.enabled = False
+        self._lock = threading.Lock()
+
+        # Number of calls and time in seconds of each span, and value of each counter:
+        self._spans = dict()
+        self._counters = dict()
+
+    def enable(self):
+        """
+        Start measuring.
+        :return: NoneType
+        """
+        self.enabled = True
+
+    def disable(self):
+        """
+        Stop measuring.
+        :return: NoneType
+        """
+        self.enabled = False
+
+    def reset(self):
+        """
+        Forget everything which was measured.
+        :return: NoneType
+        """
+        with self._lock:
+            self._spans = dict()
+            self._counters = dict()
+
+    @contextmanager
+    def span(self, name):
+        """
+        Measure time of the code in "with" block as a span with name.
+        :param name: str
+        :return: generator
+        """
+        if not self.enabled:
+            yield None
+            return
+
+        start_time = time.perf_counter()
+        try:
+            yield None
+        finally:
+            self.add_time(name, time.perf_counter() - start_time)
+
+    def add_time(self, name, seconds):
+        """
+        Add one call which took given number of seconds to a span with name.
+        :param name: str
+        :param seconds: float
+        :return: NoneType
+        """
+        with self._lock:
+            calls, total = self._spans.get(name, (0, 0.0))
+            self._spans[name] = (calls + 1, total + seconds)
+
+    def count(self, name, value=1):
+        """
+        Add value to a counter with name.
+        :param name: str
+        :param value: int
+        :return: NoneType
+        """
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def to_dict(self):
+        """
+        Return everything which was measured as dictionary:
+        {"spans": {name: {"calls": int, "seconds": float}}, "counters": {name: int}}
+        :return: dict
+        """
+        with self._lock:
+            spans = dict((name, {"calls": calls, "seconds": seconds})
+                         for name, (calls, seconds) in self._spans.items())
+            return {"spans": spans, "counters": dict(self._counters)}
+
+    def report(self):
+        """
+        Return table of spans (the longest first) and counters as str.
+        :return: str
+        """
+        profile = self.to_dict()
+        lines = ["{:<32} {:>8} {:>12}".format("Span", "Calls", "Seconds")]
+
+        for name, span in sorted(profile["spans"].items(), key=lambda item: -item[1]["seconds"]):
+            lines.append("{:<32} {:>8} {:>12.4f}".format(name, span["calls"], span["seconds"]))
+
+        if profile["counters"]:
+            lines.append("{:<32} {:>8}".format("Counter", "Value"))
+            for name in sorted(profile["counters"]):
+                lines.append("{:<32} {:>8}".format(name, profile["counters"][name]))
+
+        return "\n".join(lines)
+
+    def dump(self, file_name):
+        """
+        Write everything which was measured into a JSON file (see to_dict()).
+        :param file_name: str
+        :return: NoneType
+        """
+        # Checking argument:
+        if not isinstance(file_name, str) or not file_name.endswith(".json"):
+            raise ValueError("Name of the file must be str, and have .json extension.")
+
+        file = open(file_name, "w")
+        json.dump(self.to_dict(), file, indent=4)
+        file.close()
+
+
+# Profiler shared by the whole program:
+profiler = Profiler()
+
+
+def profiled(name):
+    """
+    Return decorator which measures every call of a function as a span with name.
+    :param name: str
+    :return: function
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not profiler.enabled:
+                return func(*args, **kwargs)
+
+            with profiler.span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
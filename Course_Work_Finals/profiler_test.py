@@ -0,0 +1,55 @@
+import os
+import json
+from profiler import *
+
+
+# Testing:
+print("Testing that disabled profiler measures nothing:")
+test_profiler = Profiler()
+with test_profiler.span("nothing"):
+    test_profiler.count("events")
+print(test_profiler.to_dict())
+assert test_profiler.to_dict() == {"spans": {}, "counters": {}}
+
+print("Testing spans and counters:")
+test_profiler.enable()
+for i in range(3):
+    with test_profiler.span("loop"):
+        test_profiler.count("events", 2)
+try:
+    with test_profiler.span("error"):
+        raise ValueError("Error in a span.")
+except ValueError:
+    pass
+profile = test_profiler.to_dict()
+print(test_profiler.report())
+assert profile["spans"]["loop"]["calls"] == 3 and profile["spans"]["error"]["calls"] == 1
+assert profile["counters"] == {"events": 6}
+
+print("Testing writing profile into a JSON file:")
+test_profiler.dump("profiler_test.json")
+file = open("profiler_test.json", "r")
+assert json.load(file) == profile
+file.close()
+os.remove("profiler_test.json")
+test_profiler.reset()
+assert test_profiler.to_dict() == {"spans": {}, "counters": {}}
+
+print("Testing profiled functions:")
+
+
+@profiled("square")
+def square(number):
+    """
+    Return square of a number.
+    :param number: int
+    :return: int
+    """
+    return number * number
+
+
+assert square(3) == 9 and "square" not in profiler.to_dict()["spans"]
+profiler.enable()
+assert square(4) == 16 and profiler.to_dict()["spans"]["square"]["calls"] == 1
+profiler.disable()
+profiler.reset()
@@ -0,0 +1,227 @@
+import time
+import math
+import threading
+from profiler import profiler
+
+
+class Clock:
+    """
+    Real clock which is used by RateLimitScheduler.
+    """
+    def time(self):
+        """
+        Return current time in seconds.
+        :return: float
+        """
+        return time.time()
+
+    def sleep(self, seconds):
+        """
+        Wait for given number of seconds.
+        :param seconds: float
+        :return: NoneType
+        """
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def sleep_until(self, moment):
+        """
+        Wait until given time.
+        :param moment: float
+        :return: NoneType
+        """
+        self.sleep(moment - self.time())
+
+
+class FakeClock(Clock):
+    """
+    Clock whose time changes only when it sleeps (so waiting takes no time at all). Useful for testing.
+    """
+    def __init__(self, start_time=0.0):
+        """
+        Initialise FakeClock by time it starts with.
+        :param start_time: float
+        """
+        self._time = start_time
+        self._lock = threading.Lock()
+
+    def time(self):
+        """
+        Return current time in seconds.
+        :return: float
+        """
+        return self._time
+
+    def sleep(self, seconds):
+        """
+        Move time forward by given number of seconds.
+        :param seconds: float
+        :return: NoneType
+        """
+        if seconds > 0:
+            with self._lock:
+                self._time += seconds
+
+    def sleep_until(self, moment):
+        """
+        Move time forward to given time (if it is not there already). Many threads can wait for the same
+        time, and it is moved only once.
+        :param moment: float
+        :return: NoneType
+        """
+        with self._lock:
+            self._time = max(self._time, moment)
+
+
+class RateLimitScheduler:
+    """
+    Scheduler of requests to Twitter API. Each endpoint (for example, "get_user" or "friends") has its own
+    window with limited number of requests (token bucket). When requests of one endpoint are over, only
+    requests to that endpoint wait for the end of its window, while other endpoints can still be used.
+    """
+    # Twitter limits for user authentication: endpoint: (number of requests, window in seconds).
+    DEFAULT_LIMITS = {"get_user": (900, 15 * 60), "friends": (15, 15 * 60), "friends_ids": (15, 15 * 60),
+                      "lookup_users": (900, 15 * 60)}
+
+    def __init__(self, limits=None, clock=None):
+        """
+        Initialise RateLimitScheduler by limits of endpoints (see DEFAULT_LIMITS) and clock. Endpoints which
+        are not in limits keep default limits.
+        :param limits: dict or NoneType
+        :param clock: Clock or NoneType
+        """
+        if limits is None:
+            limits = dict()
+        if clock is None:
+            clock = Clock()
+
+        # Checking arguments:
+        if not isinstance(limits, dict) or not isinstance(clock, Clock):
+            raise ValueError("Limits must be dict, and clock must be Clock.")
+
+        self._limits = dict(RateLimitScheduler.DEFAULT_LIMITS)
+        self._limits.update(limits)
+        self._clock = clock
+        self._lock = threading.Lock()
+
+        # Requests left and time when window ends for each endpoint:
+        self._remaining = dict()
+        self._reset_times = dict()
+
+        # How many times requests waited for each endpoint:
+        self.waits = dict()
+
+        # Ends of windows for which waiting was already announced, by endpoints:
+        self._announced = dict()
+
+    def get_clock(self):
+        """
+        Return clock of the scheduler.
+        :return: Clock
+        """
+        return self._clock
+
+    def _check_window(self, endpoint):
+        """
+        Start new window for an endpoint if previous one ended.
+        :param endpoint: str
+        :return: NoneType
+        """
+        if endpoint not in self._limits:
+            raise ValueError("Unknown endpoint: {}.".format(endpoint))
+
+        limit, window = self._limits[endpoint]
+
+        if endpoint not in self._reset_times or self._clock.time() >= self._reset_times[endpoint]:
+            self._remaining[endpoint] = limit
+            self._reset_times[endpoint] = self._clock.time() + window
+
+    def remaining(self, endpoint):
+        """
+        Return number of requests to an endpoint left in current window.
+        :param endpoint: str
+        :return: int
+        """
+        with self._lock:
+            self._check_window(endpoint)
+            return self._remaining[endpoint]
+
+    def acquire(self, endpoint):
+        """
+        Take one request of an endpoint. If there are no requests left, wait until the window ends (if
+        many threads wait for the same window, it is printed only once).
+        :param endpoint: str
+        :return: NoneType
+        """
+        while True:
+            with self._lock:
+                self._check_window(endpoint)
+
+                if self._remaining[endpoint] > 0:
+                    self._remaining[endpoint] -= 1
+                    return None
+
+                reset_time = self._reset_times[endpoint]
+                self.waits[endpoint] = self.waits.get(endpoint, 0) + 1
+
+                # Only the first request which waits for this window says so:
+                announce = self._announced.get(endpoint) != reset_time
+                self._announced[endpoint] = reset_time
+
+            if announce:
+                print("Rate limit for '{}' reached! Waiting {} seconds...".format(
+                    endpoint, math.ceil(reset_time - self._clock.time())))
+            profiler.count("rate_limit_waits." + endpoint)
+            with profiler.span("rate_limit_wait"):
+                self._clock.sleep_until(reset_time)
+
+    def try_acquire(self, endpoint, reserved_part=0.0):
+        """
+        Take one request of an endpoint only if more than reserved_part of its limit is left in current
+        window (so requests which can wait leave the rest for more important ones). Never wait. Return
+        True if the request was taken.
+        :param endpoint: str
+        :param reserved_part: float
+        :return: bool
+        """
+        with self._lock:
+            self._check_window(endpoint)
+
+            if self._remaining[endpoint] > self._limits[endpoint][0] * reserved_part:
+                self._remaining[endpoint] -= 1
+                return True
+
+            return False
+
+    def update_from_headers(self, endpoint, headers):
+        """
+        Update requests left and end of the window of an endpoint from headers of Twitter response
+        (x-rate-limit-remaining, x-rate-limit-reset). Headers which are absent are ignored.
+        :param endpoint: str
+        :param headers: dict
+        :return: NoneType
+        """
+        if not headers:
+            return None
+
+        with self._lock:
+            self._check_window(endpoint)
+
+            try:
+                if "x-rate-limit-reset" in headers:
+                    # Twitter sends time of the end of the window (in seconds since epoch):
+                    self._reset_times[endpoint] = float(headers["x-rate-limit-reset"])
+                if "x-rate-limit-remaining" in headers:
+                    self._remaining[endpoint] = int(headers["x-rate-limit-remaining"])
+            except ValueError:
+                pass
+
+    def limit_reached(self, endpoint):
+        """
+        Mark that there are no requests of an endpoint left (for example, if Twitter said so).
+        :param endpoint: str
+        :return: NoneType
+        """
+        with self._lock:
+            self._check_window(endpoint)
+            self._remaining[endpoint] = 0
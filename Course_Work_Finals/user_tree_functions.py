@@ -1,7 +1,15 @@
 import tweepy
 import copy
 from user_trees import User
-import time
+from friend_graph import FriendGraph
+import queue
+import weakref
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from rate_limit import RateLimitScheduler
+from name_cache import NameCache
+from crawl_checkpoint import CrawlCheckpoint
+from profiler import profiler, profiled
 from twitter_access_stuff import *
 
 
@@ -12,6 +20,99 @@ class UserNotFoundError(Exception):
     pass
 
 
+class NoSpareRequestsError(Exception):
+    """
+    Raised when a background request is not made, because requests of its endpoint are left for searches.
+    """
+    pass
+
+
+# Part of each window of requests which background requests leave for searches:
+REFRESH_RESERVE = 1 / 3
+
+# Scheduler of all requests to Twitter (it is shared by all threads):
+request_scheduler = RateLimitScheduler()
+
+
+def set_request_scheduler(scheduler):
+    """
+    Change scheduler of all requests to Twitter (for example, to one with fake clock for testing).
+    :param scheduler: RateLimitScheduler
+    :return: NoneType
+    """
+    # Checking argument:
+    if not isinstance(scheduler, RateLimitScheduler):
+        raise ValueError("Scheduler must be RateLimitScheduler.")
+
+    global request_scheduler
+    request_scheduler = scheduler
+
+
+# Copies of tweepy api objects made for the current thread, by the objects:
+_thread_apis = threading.local()
+
+
+def _thread_api(api):
+    """
+    Return copy of a tweepy api object made for the current thread. tweepy keeps only the response of the
+    last request in the api object (api.last_response), so each thread makes requests through its own
+    copy (with the same authorisation) and reads headers of its own responses, while requests of other
+    threads are made at the same time. Other api objects (for example, FakeTwitterAPI) are returned as
+    they are.
+    :param api: tweepy.api.API or NoneType
+    :return: tweepy.api.API or NoneType
+    """
+    if not isinstance(api, tweepy.API):
+        return api
+
+    if not hasattr(_thread_apis, "copies"):
+        _thread_apis.copies = weakref.WeakKeyDictionary()
+    if api not in _thread_apis.copies:
+        _thread_apis.copies[api] = copy.copy(api)
+
+    return _thread_apis.copies[api]
+
+
+def scheduled_request(endpoint, api, request_func, background=False):
+    """
+    Return result of request_func(api) - request to Twitter endpoint, which is made when scheduler allows
+    it. request_func gets the copy of api made for the current thread (see _thread_api()).
+    If Twitter says that rate limit is reached, request is repeated when the window of the endpoint ends.
+    Information about rate limit is read from headers of Twitter responses. Background requests never
+    wait: if less than REFRESH_RESERVE of the window of the endpoint is left, NoSpareRequestsError is
+    raised.
+    :param endpoint: str
+    :param api: tweepy.api.API
+    :param request_func: function
+    :param background: bool
+    :return: object
+    """
+    api = _thread_api(api)
+
+    while True:
+        if not background:
+            request_scheduler.acquire(endpoint)
+        elif not request_scheduler.try_acquire(endpoint, REFRESH_RESERVE):
+            raise NoSpareRequestsError("Requests of '{}' are left for searches.".format(endpoint))
+        profiler.count("api_calls." + endpoint)
+
+        try:
+            with profiler.span("api." + endpoint):
+                result = request_func(api)
+        except tweepy.error.RateLimitError as error:
+            response = getattr(error, "response", None)
+            request_scheduler.update_from_headers(endpoint, getattr(response, "headers", None))
+            request_scheduler.limit_reached(endpoint)
+            if background:
+                raise NoSpareRequestsError("Rate limit of '{}' is reached.".format(endpoint))
+            continue
+
+        # Headers of this request (only this thread makes requests through api):
+        response = getattr(api, "last_response", None)
+        request_scheduler.update_from_headers(endpoint, getattr(response, "headers", None))
+        return result
+
+
 def authorise(consumer_key, consumer_secret, access_token, access_token_secret):
     """
     Return api object from access tokens and keys.
@@ -32,6 +133,36 @@ def authorise(consumer_key, consumer_secret, access_token, access_token_secret):
     return api
 
 
+# Api object shared by the whole program (it is created when it is needed first time):
+_shared_api = None
+
+
+def get_api():
+    """
+    Return api object authorised with keys and tokens from twitter_access_stuff. The same object is
+    returned every time.
+    :return: tweepy.api.API
+    """
+    global _shared_api
+    if _shared_api is None:
+        _shared_api = authorise(consumer_key, consumer_secret, access_token, access_token_secret)
+
+    return _shared_api
+
+
+def set_api(api):
+    """
+    Change api object shared by the whole program. It may be any object with the same methods as
+    tweepy.API which are used by the program (for example, FakeTwitterAPI). If api is None, api object
+    authorised on Twitter is used again.
+    :param api: tweepy.api.API or FakeTwitterAPI or NoneType
+    :return: NoneType
+    """
+    global _shared_api
+    _shared_api = api
+
+
+@profiled("get_user")
 def get_user(api, user_name):
     """
     Return user object if there is user with such name on Twitter. Raise UserNotFoundError if there is no
@@ -46,53 +177,122 @@ def get_user(api, user_name):
 
     # Main part:
     try:
-        user = api.get_user(user_name)
+        user = scheduled_request("get_user", api, lambda thread_api: thread_api.get_user(user_name))
         return user
     except tweepy.error.TweepError:
         raise UserNotFoundError("No Twitter user with such name/id exists.")
 
 
+def _is_protected_error(error):
+    """
+    Return True if Twitter answered that information of the user can't be got (he is protected, suspended
+    or deleted), and False if the request itself failed (for example, connection was lost or Twitter
+    didn't work), so it may succeed later.
+    :param error: tweepy.error.TweepError
+    :return: bool
+    """
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None) in (401, 403, 404)
+
+
+@profiled("get_friends")
 def get_friends(user):
     """
-    Return list of friends of user. If rate limit is exceeded, it will wait 15 minutes.
+    Return list of friends of user. If rate limit is exceeded, it will wait until the window of
+    "friends" requests ends. If the request fails not because the user is protected,
+    tweepy.error.TweepError is raised.
     :param user: tweepy.models.User
     :return: list of tweepy.models.User
     """
     try:
-        friends = user.friends()
+        friends = scheduled_request("friends", getattr(user, "_api", None),
+                                    lambda thread_api: thread_api.friends(user_id=user.id))
         return friends[:]
-    except tweepy.error.RateLimitError:
-        print("Rate limit reached! Waiting...")
-        wait_15_minutes()
-        return get_friends(user)
-    except tweepy.error.TweepError:
+    except tweepy.error.TweepError as error:
+        if not _is_protected_error(error):
+            raise
         print("Skipping user whose information is protected.")
         return list()
 
 
+@profiled("get_friends_ids")
 def get_friends_ids(api, user_id):
     """
-    Return list of ids of friends of the user with given id.
+    Return list of ids of friends of the user with given id. Only ids are requested (without information
+    about friends), page by page, so all friends are returned even if there are thousands of them. If
+    rate limit is exceeded, it will wait until the window of "friends_ids" requests ends. Empty list is
+    returned for protected users, and if a request fails for another reason (for example, connection is
+    lost), tweepy.error.TweepError is raised, so an incomplete list is never returned.
     :param api: tweepy.api.API
     :param user_id: int
     :return: list of int
     """
-    # Getting user object:
-    user = get_user(api, user_id)
+    try:
+        return _request_friends_ids(api, user_id)
+    except tweepy.error.TweepError as error:
+        if not _is_protected_error(error):
+            raise
+        print("Skipping user whose information is protected.")
+        return list()
 
-    # Getting list of friends of the user:
-    friends = get_friends(user)
 
-    # Returning ids of friends of the user:
-    return [friend.id for friend in friends]
+def _request_friends_ids(api, user_id, background=False):
+    """
+    Return list of ids of friends of the user with given id got from Twitter page by page. Errors of
+    requests are raised. See scheduled_request() for background.
+    :param api: tweepy.api.API
+    :param user_id: int
+    :param background: bool
+    :return: list of int
+    """
+    result_list = []
+
+    # Cursor of the first page is -1, and there are no pages after the one with next cursor 0:
+    cursor = -1
+    while cursor != 0:
+        ids, cursors = scheduled_request("friends_ids", api,
+                                         lambda thread_api: thread_api.friends_ids(user_id=user_id, cursor=cursor),
+                                         background)
+        result_list.extend(ids)
+        cursor = cursors[1]
+
+    return result_list
+
+
+def get_many_friends_ids(friends_func, ids_list, workers=1):
+    """
+    Return list of lists of ids of friends of users with ids from ids_list (in the same order). friends_func
+    must return list of ids of friends of the user with given id. If workers is bigger than 1, friends of
+    users are got at the same time by that many threads.
+    :param friends_func: function
+    :param ids_list: list of int
+    :param workers: int
+    :return: list of list
+    """
+    # Checking input:
+    if not isinstance(workers, int) or workers < 1:
+        raise ValueError("Number of workers must be int bigger than zero.")
 
+    # Getting friends one by one:
+    if workers == 1 or len(ids_list) < 2:
+        return [friends_func(id_num) for id_num in ids_list]
 
-def build_friend_tree(api, user_id, height):
+    # Getting friends at the same time (map keeps order of users):
+    with ThreadPoolExecutor(max_workers=min(workers, len(ids_list))) as executor:
+        return list(executor.map(friends_func, ids_list))
+
+
+def build_friend_tree(api, user_id, height, workers=1, cache=None):
     """
     Return tree of friends of a user with given depth( 1 - only friends, 2 - plus friends of friends, ...).
+    Friends of users of each level are got by workers threads at the same time. If cache is given, friends
+    of users are read from it, and only friends of users who are not in it are got from Twitter (and
+    written into it).
     :param api: tweepy.api.API
     :param user_id: int
     :param height: int
+    :param workers: int
+    :param cache: FriendsCache or NoneType
     :return: User
     """
     # Checking arguments:
@@ -109,16 +309,24 @@ def build_friend_tree(api, user_id, height):
     # Main part of the function:
     tree_root = User(user_id)
 
+    # Source of friends:
+    if cache is None:
+        def friends_func(id_num):
+            return get_friends_ids(api, id_num)
+    else:
+        def friends_func(id_num):
+            return get_cached_friends_ids(api, cache, id_num)
+
     # "Growing" tree level by level:
     for level in range(height):
         # Getting all users of current level of search:
         users_on_level = tree_root.users_of_level(level)
 
-        # For each of those users getting friends and adding them:
-        for user in users_on_level:
-            # Getting list of ids of friends of the user:
-            friends_ids = get_friends_ids(api, user.get_id_num())
+        # Getting lists of ids of friends of all those users:
+        friends_lists = get_many_friends_ids(friends_func, [user.get_id_num() for user in users_on_level], workers)
 
+        # For each of those users adding friends:
+        for user, friends_ids in zip(users_on_level, friends_lists):
             # Creating a list of User objects:
             friends_users = [User(friend_id) for friend_id in friends_ids]
 
@@ -129,27 +337,6 @@ def build_friend_tree(api, user_id, height):
     return tree_root
 
 
-def wait_15_minutes():
-    """
-    Wait for 15 minutes and print current waiting time.
-    :return: NoneType
-    """
-    # Waiting:
-    for i in range(15):
-        if i == 14:
-            print("1 minute of waiting left.")
-        else:
-            print("{} minutes of waiting left.".format(15 - i))
-        time.sleep(60)
-
-    # Just in case:
-    time.sleep(5)
-
-    # After waiting:
-    print("Waiting ended!")
-    return None
-
-
 def dict_from_file(file_name):
     """
     Read information about users from a text file and enter it into a dictionary.
@@ -203,7 +390,8 @@ def dict_from_file(file_name):
 
 def tree_from_dict(user_id, user_dict, height):
     """
-    Create tree from id of the user and dictionary of friends of users.
+    Create tree from id of the user and dictionary of friends of users. Users who are not in the
+    dictionary are considered to have no friends.
     :param user_id: int
     :param user_dict: dict
     :param height: int
@@ -228,7 +416,7 @@ def tree_from_dict(user_id, user_dict, height):
         # For each of those users getting friends and adding them:
         for user in users_on_level:
             # Getting list of ids of friends of the user:
-            friends_ids = user_dict[user.get_id_num()]
+            friends_ids = user_dict.get(user.get_id_num(), [])
 
             # Creating a list of User objects:
             friends_users = [User(friend_id) for friend_id in friends_ids]
@@ -240,29 +428,352 @@ def tree_from_dict(user_id, user_dict, height):
     return tree_root
 
 
-def find_mutual_ids(tree_1, tree_2):
+def get_cached_friends_ids(api, cache, user_id):
     """
-    Return ids of mutual users of tree_1 and tree_2 as list.
-    :param tree_1: User
-    :param tree_2: User
+    Return list of ids of friends of the user with given id from a cache. If he is not in a cache, ids are
+    got from Twitter and written into a cache at once, so they are not lost if the program stops (if
+    getting them fails, see get_friends_ids(), the error is raised and nothing is written). If
+    information in a cache is not fresh, it is returned anyway, and new information is got from Twitter
+    in the background (when rate limit allows it).
+    :param api: tweepy.api.API
+    :param cache: FriendsCache
+    :param user_id: int
     :return: list of int
     """
-    # Getting lists of all the users:
-    all_users_1 = tree_1.all_users() + [tree_1]
-    all_users_2 = tree_2.all_users() + [tree_2]
+    friends_ids = cache.get_friends(user_id)
 
-    result_list = []
+    if friends_ids is None:
+        profiler.count("friends_cache.misses")
+        friends_ids = get_friends_ids(api, user_id)
+        cache.set_friends(user_id, friends_ids)
+    elif not cache.is_fresh(user_id):
+        profiler.count("friends_cache.stale_hits")
+        refresh_in_background(api, cache, user_id)
+    else:
+        profiler.count("friends_cache.hits")
 
-    # Changing types of values in lists:
-    all_users_1 = [user.get_id_num() for user in all_users_1]
-    all_users_2 = [user.get_id_num() for user in all_users_2]
+    return friends_ids
 
-    # Checking:
-    for user in all_users_1:
-        if user in all_users_2:
-            result_list.append(user)
 
-    return result_list
+# Users whose friends are being refreshed in the background:
+_refresh_queue = queue.Queue()
+_refresh_pending = set()
+_refresh_lock = threading.Lock()
+_refresh_thread = None
+
+
+def refresh_in_background(api, cache, user_id):
+    """
+    Get friends of the user with given id from Twitter and write them into a cache in a background thread.
+    The user is not added again if his friends are already waiting to be refreshed. Friends are refreshed
+    only while searches don't need requests (see scheduled_request()); otherwise, and if getting them
+    fails, old friends stay in a cache and are refreshed next time they are used.
+    :param api: tweepy.api.API
+    :param cache: FriendsCache
+    :param user_id: int
+    :return: NoneType
+    """
+    global _refresh_thread
+
+    with _refresh_lock:
+        if (cache, user_id) in _refresh_pending:
+            return None
+        _refresh_pending.add((cache, user_id))
+        _refresh_queue.put((api, cache, user_id))
+
+        # Background thread doesn't stop the program from exiting:
+        if _refresh_thread is None:
+            _refresh_thread = threading.Thread(target=_refresh_worker, daemon=True)
+            _refresh_thread.start()
+
+
+def _refresh_worker():
+    """
+    Refresh friends of users from the queue one by one (it runs in a background thread).
+    :return: NoneType
+    """
+    while True:
+        api, cache, user_id = _refresh_queue.get()
+        try:
+            cache.set_friends(user_id, _request_friends_ids(api, user_id, background=True))
+        except Exception:
+            # Information stays old (even if the user became protected), and it will be refreshed next time
+            # it is used:
+            profiler.count("friends_cache.failed_refreshes")
+        finally:
+            with _refresh_lock:
+                _refresh_pending.discard((cache, user_id))
+            _refresh_queue.task_done()
+
+
+def wait_for_refreshes():
+    """
+    Wait until all friends waiting to be refreshed in the background are refreshed.
+    :return: NoneType
+    """
+    _refresh_queue.join()
+
+
+def build_friend_graph(api, user_id, height, workers=1, cache=None):
+    """
+    Same as build_friend_tree(), but return compact graph of friends, in which each user is stored once.
+    If cache is given, friends of users who are in it are not got from Twitter, and friends of all other
+    users are written into it as soon as they are got (so if building stops, it can be continued later).
+    :param api: tweepy.api.API
+    :param user_id: int
+    :param height: int
+    :param workers: int
+    :param cache: FriendsCache or NoneType
+    :return: FriendGraph
+    """
+    # Checking arguments:
+    if not isinstance(user_id, int) or not isinstance(height, int):
+        raise ValueError("User id and height of a tree must be int.")
+
+    # Checking if such user exists - this will raise error if not:
+    get_user(api, user_id)
+
+    if cache is None:
+        return _grow_graph(user_id, lambda id_num: get_friends_ids(api, id_num), height, workers)
+
+    return _grow_graph(user_id, lambda id_num: get_cached_friends_ids(api, cache, id_num), height, workers)
+
+
+def graph_from_dict(user_id, user_dict, height):
+    """
+    Same as tree_from_dict(), but return compact graph of friends, in which each user is stored once.
+    :param user_id: int
+    :param user_dict: dict
+    :param height: int
+    :return: FriendGraph
+    """
+    # Checking input:
+    if not isinstance(user_id, int) or user_id < 0 or not isinstance(user_dict, dict):
+        raise ValueError("Id of the user must be int bigger than zero, and user_dict must be dict.")
+
+    return _grow_graph(user_id, lambda id_num: user_dict.get(id_num, []), height)
+
+
+def graph_from_cache(user_id, cache, height):
+    """
+    Same as graph_from_dict(), but friends of users are read from a cache (users who are not in a cache
+    are considered to have no friends).
+    :param user_id: int
+    :param cache: FriendsCache
+    :param height: int
+    :return: FriendGraph
+    """
+    # Checking input:
+    if not isinstance(user_id, int) or user_id < 0:
+        raise ValueError("Id of the user must be int bigger than zero.")
+
+    return _grow_graph(user_id, lambda id_num: cache.get_friends(id_num) or [], height)
+
+
+def _grow_graph(user_id, friends_func, height, workers=1):
+    """
+    Create graph of friends of the user level by level. friends_func must return list of ids of friends of
+    the user with given id. Friends of users of each level are got by workers threads at the same time.
+    :param user_id: int
+    :param friends_func: function
+    :param height: int
+    :param workers: int
+    :return: FriendGraph
+    """
+    return FrontierCrawler(friends_func, workers).crawl(user_id, height)
+
+
+class FrontierCrawler:
+    """
+    Crawler which builds graphs of friends level by level: friends of all users of the last found level
+    (frontier) are got at the same time, and their new friends become the next frontier. Friends of each
+    user are got only once for all graphs built by one crawler, friends of users of the last level are
+    never got, and crawling stops as soon as there are no new users. Number of users whose friends were
+    got is counted for each level. If checkpoint is given, friends of users are added to it as soon as
+    they are got, and friends which are already in it are not got again.
+    """
+    def __init__(self, friends_func, workers=1, checkpoint=None):
+        """
+        Initialise FrontierCrawler by function which returns list of ids of friends of the user with given
+        id, number of threads which get friends at the same time and checkpoint of the search.
+        :param friends_func: function
+        :param workers: int
+        :param checkpoint: CrawlCheckpoint or NoneType
+        """
+        # Checking arguments:
+        if not callable(friends_func) or not isinstance(workers, int) or workers < 1:
+            raise ValueError("friends_func must be function, number of workers must be int bigger than zero.")
+        if checkpoint is not None and not isinstance(checkpoint, CrawlCheckpoint):
+            raise ValueError("Checkpoint must be CrawlCheckpoint or None.")
+
+        self._friends_func = friends_func
+        self._workers = workers
+        self._checkpoint = checkpoint
+        self._lock = threading.Lock()
+
+        # Friends of users whose friends were already got (by this search or before it was stopped):
+        if checkpoint is None:
+            self._friends = dict()
+        else:
+            self._friends = checkpoint.get_friends()
+
+        # Number of users whose friends were got on each level and by all searches:
+        self._fetch_counts = []
+        self._fetches_num = 0
+
+    def friends_of(self, id_num):
+        """
+        Return list of ids of friends of the user with id_num (they are got only once).
+        :param id_num: int
+        :return: list of int
+        """
+        friends_ids = self._friends.get(id_num)
+
+        if friends_ids is None:
+            friends_ids = self._friends_func(id_num)
+            self._friends[id_num] = friends_ids
+
+            with self._lock:
+                self._fetches_num += 1
+            if self._checkpoint is not None:
+                self._checkpoint.add(id_num, friends_ids)
+
+        return friends_ids
+
+    @profiled("crawl")
+    def crawl(self, user_id, height):
+        """
+        Return graph of friends of the user with given depth (1 - only friends, 2 - plus friends of
+        friends, ...).
+        :param user_id: int
+        :param height: int
+        :return: FriendGraph
+        """
+        # Checking if height is correct:
+        if not isinstance(height, int) or not (0 < height < 10):
+            raise ValueError("Height must be integer number from 1 to 9.")
+
+        graph = FriendGraph(user_id)
+        frontier = [user_id]
+
+        for level in range(height):
+            # Nobody new was found:
+            if not frontier:
+                break
+
+            # Getting friends only of users who were not expanded yet (by this or previous searches):
+            new_ids = [id_num for id_num in frontier if id_num not in self._friends]
+            get_many_friends_ids(self.friends_of, new_ids, self._workers)
+
+            if level == len(self._fetch_counts):
+                self._fetch_counts.append(0)
+            self._fetch_counts[level] += len(new_ids)
+
+            for id_num in frontier:
+                graph.set_friends(id_num, self._friends[id_num])
+
+            frontier = graph.users_of_level(level + 1)
+
+        return graph
+
+    def get_fetch_counts(self):
+        """
+        Return list of numbers of users whose friends were got on each level (by all searches).
+        :return: list of int
+        """
+        return list(self._fetch_counts)
+
+    def fetches_num(self):
+        """
+        Return number of users whose friends were got (by all searches).
+        :return: int
+        """
+        return self._fetches_num
+
+
+def tree_ids(tree):
+    """
+    Return ids of all users of a tree or graph of friends (including the root, repeated users are ignored).
+    :param tree: User or FriendGraph
+    :return: list of int
+    """
+    if isinstance(tree, FriendGraph):
+        return tree.all_ids()
+
+    return [user.get_id_num() for user in tree.iter_preorder()]
+
+
+def tree_depths(tree):
+    """
+    Return dictionary of levels of the first occurrences of all users of a tree or graph of friends by
+    their ids (level of the root is 0).
+    :param tree: User or FriendGraph
+    :return: dict
+    """
+    if isinstance(tree, FriendGraph):
+        return tree.levels_dict()
+
+    return dict((user.get_id_num(), user.get_level()) for user in tree.iter_preorder())
+
+
+def tree_edges(tree):
+    """
+    Return list of pairs (user id, friend id) for all users of a tree or graph of friends (repeated users
+    are ignored).
+    :param tree: User or FriendGraph
+    :return: list of tuple
+    """
+    if isinstance(tree, FriendGraph):
+        return tree.edges()
+
+    return [(user.get_id_num(), child.get_id_num()) for user in tree.iter_preorder()
+            for child in user.get_children()]
+
+
+def _link_to_root(id_num, tree):
+    """
+    Return list of ids connecting the root of a tree or graph with the user with id_num.
+    :param id_num: int
+    :param tree: User or FriendGraph
+    :return: list of int
+    """
+    if isinstance(tree, FriendGraph):
+        return tree.link_to_root(id_num)
+
+    user = tree.user_by_id(id_num)
+    result_list = [user.get_id_num()]
+    while user.get_parent() is not None:
+        user = user.get_parent()
+        result_list.append(user.get_id_num())
+
+    return result_list[::-1]
+
+
+@profiled("find_mutual_depths")
+def find_mutual_depths(tree_1, tree_2):
+    """
+    Return list of tuples (id of the user, his level in tree_1, his level in tree_2) for all mutual users
+    of tree_1 and tree_2 (in order they are in tree_1).
+    :param tree_1: User or FriendGraph
+    :param tree_2: User or FriendGraph
+    :return: list of tuple
+    """
+    # Levels of all the users by their ids (looking up an id in dict doesn't depend on size of a tree):
+    depths_1 = tree_depths(tree_1)
+    depths_2 = tree_depths(tree_2)
+
+    return [(id_num, depth, depths_2[id_num]) for id_num, depth in depths_1.items() if id_num in depths_2]
+
+
+@profiled("find_mutual_ids")
+def find_mutual_ids(tree_1, tree_2):
+    """
+    Return ids of mutual users of tree_1 and tree_2 as list.
+    :param tree_1: User or FriendGraph
+    :param tree_2: User or FriendGraph
+    :return: list of int
+    """
+    return [id_num for id_num, depth_1, depth_2 in find_mutual_depths(tree_1, tree_2)]
 
 
 def find_link_length(user_id, tree_1, tree_2):
@@ -270,78 +781,259 @@ def find_link_length(user_id, tree_1, tree_2):
     Find length of link between two users (tree_1 and tree_1 roots) from the user with user_id. It
     is assummed that user_id is in both trees.
     :param user_id: int
-    :param tree_1: User
-    :param tree_2: User
+    :param tree_1: User or FriendGraph
+    :param tree_2: User or FriendGraph
     :return: int
     """
-    # Representations of users in both trees:
-    user_1 = tree_1.user_by_id(user_id)
-    user_2 = tree_2.user_by_id(user_id)
-
-    return user_1.get_level() + user_2.get_level()
+    # Links from roots of both trees to the user:
+    return len(_link_to_root(user_id, tree_1)) + len(_link_to_root(user_id, tree_2)) - 2
 
 
 def find_min_link(ids_list, tree_1, tree_2):
     """
     Return id of the user by which tree_1 and tree_2 roots are connected by least amount of mutual friends.
     :param ids_list: list of int
-    :param tree_1: User
-    :param tree_2: User
+    :param tree_1: User or FriendGraph
+    :param tree_2: User or FriendGraph
     :return: int
     """
     # Checking input:
-    if not isinstance(ids_list, list) or not isinstance(tree_1, User) or not isinstance(tree_2, User):
+    if not isinstance(ids_list, list) or not isinstance(tree_1, (User, FriendGraph)) or \
+            not isinstance(tree_2, (User, FriendGraph)):
         raise ValueError("Incorrect arguments.")
 
-    result_id = ids_list[0]
-    for id1 in ids_list:
-        if find_link_length(id1, tree_1, tree_2) < find_link_length(result_id, tree_1, tree_2):
-            result_id = id1
+    # Levels of users are found once, so length of each link is got at once:
+    depths_1 = tree_depths(tree_1)
+    depths_2 = tree_depths(tree_2)
 
-    return result_id
+    return min(ids_list, key=lambda id_num: depths_1[id_num] + depths_2[id_num])
+
+
+def rank_mutual_ids(tree_1, tree_2, links_num=None):
+    """
+    Return ids of mutual users of tree_1 and tree_2 sorted by length of links between roots through them
+    (shortest first). Only links_num first ids are returned (all by default).
+    :param tree_1: User or FriendGraph
+    :param tree_2: User or FriendGraph
+    :param links_num: int or NoneType
+    :return: list of int
+    """
+    # Checking input:
+    if links_num is not None and (not isinstance(links_num, int) or links_num < 0):
+        raise ValueError("Number of links must be int not less than zero or None.")
+
+    # Mutual users grouped by length of links (lengths are small numbers, so ids don't have to be sorted):
+    ids_by_length = []
+    for id_num, depth_1, depth_2 in find_mutual_depths(tree_1, tree_2):
+        length = depth_1 + depth_2
+        while len(ids_by_length) <= length:
+            ids_by_length.append([])
+        ids_by_length[length].append(id_num)
+
+    result_list = []
+    for ids_list in ids_by_length:
+        result_list.extend(ids_list)
+
+        # Longer links are not needed:
+        if links_num is not None and len(result_list) >= links_num:
+            return result_list[:links_num]
+
+    return result_list
 
 
 def link_to_list(id_num, tree_1, tree_2):
     """
     Return list of ids connecting two users - roots of tree_1 and tree_2 (including ids of those users).
     :param id_num: int
-    :param tree_1: User
-    :param tree_2: User
+    :param tree_1: User or FriendGraph
+    :param tree_2: User or FriendGraph
     :return: list
     """
     # Checking input:
-    if not isinstance(id_num, int) or id_num < 0 or not isinstance(tree_1, User) or not isinstance(tree_2, User):
+    if not isinstance(id_num, int) or id_num < 0 or not isinstance(tree_1, (User, FriendGraph)) or \
+            not isinstance(tree_2, (User, FriendGraph)):
+        raise ValueError("Incorrect function arguments!")
+
+    # Link from root of tree_1 to the user, and then from the user to root of tree_2:
+    return _link_to_root(id_num, tree_1) + _link_to_root(id_num, tree_2)[::-1][1:]
+
+
+def _shortest_parents(tree):
+    """
+    Return dictionary of lists of all parents of users of a tree or graph of friends by their ids: users of
+    the previous level who have the user as a friend (the root has no parents). So all shortest ways from
+    the root to each user are kept, not only the way to his first occurrence.
+    :param tree: User or FriendGraph
+    :return: dict
+    """
+    levels = tree_depths(tree)
+
+    # Friends of users (including repeated ones):
+    if isinstance(tree, FriendGraph):
+        friends_lists = tree.friends_lists()
+    else:
+        friends_lists = [(user.get_id_num(), [child.get_id_num() for child in user.get_children(False)])
+                         for user in tree.iter_preorder()]
+
+    result_dict = dict((id_num, []) for id_num in levels)
+    for id_num, friends_ids in friends_lists:
+        for friend_id in friends_ids:
+            if levels[friend_id] == levels[id_num] + 1:
+                result_dict[friend_id].append(id_num)
+
+    return result_dict
+
+
+def iter_shortest_links(tree_1, tree_2):
+    """
+    Generate links (lists of ids) connecting roots of tree_1 and tree_2 from the shortest to the longest.
+    Links through each mutual user go along all shortest ways from both roots to him (not only along his
+    first occurrences), and each link is generated once. Links which go through some user twice (both
+    ways to a mutual user pass another mutual user) are skipped. Links are made only when they are
+    needed, so taking only first few of them is fast.
+    :param tree_1: User or FriendGraph
+    :param tree_2: User or FriendGraph
+    :return: generator of list
+    """
+    # Checking input:
+    if not isinstance(tree_1, (User, FriendGraph)) or not isinstance(tree_2, (User, FriendGraph)):
         raise ValueError("Incorrect function arguments!")
 
-    result_list = [id_num]
+    parents_1 = _shortest_parents(tree_1)
+    parents_2 = _shortest_parents(tree_2)
+    found_links = set()
+
+    for id_num in rank_mutual_ids(tree_1, tree_2):
+        for path_1 in _paths_to_root(id_num, parents_1):
+            for path_2 in _paths_to_root(id_num, parents_2):
+                # Only the mutual user may be in both ways:
+                if len(set(path_1) & set(path_2)) > 1:
+                    continue
+
+                link = path_1[::-1] + path_2[1:]
+                if tuple(link) not in found_links:
+                    found_links.add(tuple(link))
+                    yield link
+
+
+def links_trie(list_of_links):
+    """
+    Return trie of links: dictionary whose keys are first ids of links, and values are tries of the rest
+    of those links. Links with the same beginning share it, so each step is kept only once.
+    :param list_of_links: list of list
+    :return: dict
+    """
+    trie = dict()
+
+    for link in list_of_links:
+        node = trie
+        for id_num in link:
+            node = node.setdefault(id_num, dict())
+
+    return trie
 
-    # User representation in tree_1:
-    user_1 = tree_1.user_by_id(id_num)
-    while user_1.get_parent() is not None:
-        user_1 = user_1.get_parent()
-        result_list = [user_1.get_id_num()] + result_list
 
-    # ... in tree_2:
-    user_2 = tree_2.user_by_id(id_num)
-    while user_2.get_parent() is not None:
-        user_2 = user_2.get_parent()
-        result_list.append(user_2.get_id_num())
+def trie_edges(trie):
+    """
+    Return list of pairs (id, next id) for all steps of a trie of links (see links_trie()).
+    :param trie: dict
+    :return: list of tuple
+    """
+    result_list = []
+    nodes = [trie]
+
+    while nodes:
+        node = nodes.pop()
+        for id_num, next_node in node.items():
+            for next_id in next_node:
+                result_list.append((id_num, next_id))
+            nodes.append(next_node)
 
     return result_list
 
 
+# Screen names of users which were already found (names used least recently are forgotten first):
+name_cache = NameCache("names_cache.txt")
+name_cache.load()
+
+
+def set_name_cache(cache):
+    """
+    Change cache of screen names used by default (for example, so names of fake users are not mixed with
+    names of real ones).
+    :param cache: NameCache
+    :return: NoneType
+    """
+    # Checking argument:
+    if not isinstance(cache, NameCache):
+        raise ValueError("Cache of names must be NameCache.")
+
+    global name_cache
+    name_cache = cache
+
+
+@profiled("get_screen_names")
+def get_screen_names(api, ids_list, cache=None):
+    """
+    Return dictionary with screen names of users with ids from ids_list. Names which are not in a cache
+    (name_cache by default) are requested from Twitter by 100 at a time and saved into it. If there is no
+    user with some id on Twitter, his id is used as a name.
+    :param api: tweepy.api.API
+    :param ids_list: list of int
+    :param cache: NameCache or NoneType
+    :return: dict
+    """
+    if cache is None:
+        cache = name_cache
+
+    # Ids of users whose names are unknown (without repeats):
+    unknown_ids = []
+    for id_num in ids_list:
+        if id_num not in cache:
+            unknown_ids.append(id_num)
+    unknown_ids = list(dict.fromkeys(unknown_ids))
+    profiler.count("name_cache.misses", len(unknown_ids))
+
+    # Getting names from Twitter (they are kept here too, because a cache may be too small for all of them):
+    found_names = dict()
+    for i in range(0, len(unknown_ids), 100):
+        ids_batch = unknown_ids[i:i + 100]
+        try:
+            users = scheduled_request("lookup_users", api,
+                                      lambda thread_api: thread_api.lookup_users(user_ids=ids_batch))
+        except tweepy.error.TweepError:
+            continue
+
+        for user in users:
+            found_names[user.id] = user.screen_name
+            cache.set(user.id, user.screen_name)
+
+    if unknown_ids:
+        cache.save()
+
+    # Finally:
+    result_dict = dict()
+    for id_num in ids_list:
+        name = found_names.get(id_num)
+        if name is None:
+            name = cache.get(id_num)
+        if name is None:
+            name = str(id_num)
+        result_dict[id_num] = name
+
+    return result_dict
+
+
+@profiled("link_to_string")
 def link_to_string(link_list):
     """
     Return string representation of a link list.
     :param link_list: list of int
     :return: str
     """
-    api = authorise(consumer_key, consumer_secret, access_token, access_token_secret)
+    id_names_dict = get_screen_names(get_api(), link_list)
 
-    list_of_names = []
-
-    for id_num in link_list:
-        list_of_names.append(get_user(api, id_num).screen_name)
+    list_of_names = [id_names_dict[id_num] for id_num in link_list]
 
     # Creating string:
     result_str = ""
@@ -351,3 +1043,114 @@ def link_to_string(link_list):
     result_str = result_str + list_of_names[-1]
 
     return result_str
+
+
+@profiled("bidirectional_search")
+def bidirectional_search(friends_func, id_1, id_2, height, workers=1):
+    """
+    Return list of shortest links (lists of ids, like ones from link_to_list) connecting users with id_1 and
+    id_2 through their mutual friends. Friends of both users are searched at the same time level by level
+    (smaller level first), and search stops as soon as the shortest link is found, so there is no need to
+    build two full trees. Each user is searched no deeper than height. friends_func must return list of ids
+    of friends of the user with given id (for example, lambda id_num: get_friends_ids(api, id_num)).
+    Friends of users of each level are got by workers threads at the same time. Return empty list if there
+    is no link.
+    :param friends_func: function
+    :param id_1: int
+    :param id_2: int
+    :param height: int
+    :param workers: int
+    :return: list of list
+    """
+    # Checking input:
+    if not callable(friends_func) or not isinstance(id_1, int) or not isinstance(id_2, int):
+        raise ValueError("friends_func must be function, ids of the users must be int.")
+
+    # Checking if height is correct:
+    if not (0 < height < 10):
+        raise ValueError("Height must be integer number from 1 to 9.")
+
+    # For each side: levels of found users, lists of parents of found users and last level:
+    levels = [{id_1: 0}, {id_2: 0}]
+    parents = [{id_1: []}, {id_2: []}]
+    frontiers = [[id_1], [id_2]]
+    depths = [0, 0]
+
+    # Length of the shortest found link and ids of users in the middle of such links:
+    best_length = None
+    middle_ids = []
+
+    # Checking if users are the same:
+    if id_1 == id_2:
+        best_length, middle_ids = 0, [id_1]
+
+    while True:
+        # Sides which can still be searched deeper:
+        open_sides = [side for side in (0, 1) if depths[side] < height and frontiers[side]]
+
+        # Every link which is not found yet is longer than this:
+        if open_sides:
+            lower_bound = min(depths[side] + 1 for side in open_sides)
+        else:
+            lower_bound = None
+
+        # Stopping if shortest link is found or there is nowhere to search:
+        if lower_bound is None or (best_length is not None and best_length <= lower_bound):
+            break
+
+        # Searching the side with smaller last level (or the side which is searched less deep):
+        side = min(open_sides, key=lambda s: (len(frontiers[s]), depths[s]))
+        side_levels, side_parents = levels[side], parents[side]
+        other_levels = levels[1 - side]
+        new_frontier = []
+
+        friends_lists = get_many_friends_ids(friends_func, frontiers[side], workers)
+
+        for id_num, friends_ids in zip(frontiers[side], friends_lists):
+            for friend_id in friends_ids:
+                # New user:
+                if friend_id not in side_levels:
+                    side_levels[friend_id] = depths[side] + 1
+                    side_parents[friend_id] = [id_num]
+                    new_frontier.append(friend_id)
+                # Another way to the user on the same level:
+                elif side_levels[friend_id] == depths[side] + 1:
+                    side_parents[friend_id].append(id_num)
+
+        frontiers[side] = new_frontier
+        depths[side] += 1
+
+        # Checking if new users were found by the other side too:
+        for id_num in new_frontier:
+            if id_num in other_levels:
+                length = depths[side] + other_levels[id_num]
+                if best_length is None or length < best_length:
+                    best_length, middle_ids = length, [id_num]
+                elif length == best_length and id_num not in middle_ids:
+                    middle_ids.append(id_num)
+
+    # Building links:
+    result_list = []
+    for middle_id in middle_ids:
+        for path_1 in _paths_to_root(middle_id, parents[0]):
+            for path_2 in _paths_to_root(middle_id, parents[1]):
+                result_list.append(path_1[::-1] + path_2[1:])
+
+    return result_list
+
+
+def _paths_to_root(id_num, parents):
+    """
+    Generate all paths (lists of ids) from the user with id_num to the root of the search using dictionary
+    of lists of parents of users. Paths are made only when they are needed.
+    :param id_num: int
+    :param parents: dict
+    :return: generator of list
+    """
+    if not parents[id_num]:
+        yield [id_num]
+        return
+
+    for parent_id in parents[id_num]:
+        for path in _paths_to_root(parent_id, parents):
+            yield [id_num] + path
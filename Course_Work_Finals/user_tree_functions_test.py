@@ -0,0 +1,401 @@
+import os
+import io
+import contextlib
+import time
+import types
+import threading
+import tweepy
+from user_tree_functions import *
+from rate_limit import *
+from friends_cache import *
+from fake_twitter import *
+
+
+# Testing:
+
+# Small graph of friends (user: list of his friends):
+friends_dict = {1: [2, 3, 4], 2: [5, 6], 3: [7], 4: [], 5: [9], 6: [], 7: [8],
+                10: [11, 12], 11: [7, 13], 12: [3], 13: [], 8: [], 9: []}
+
+print("Testing bidirectional search:")
+links = bidirectional_search(lambda id_num: friends_dict.get(id_num, []), 1, 10, 2)
+print(links)
+assert links == [[1, 3, 12, 10]]
+
+print("Testing bidirectional search when there are two shortest links:")
+friends_dict[2] = [5, 6, 12]
+links = bidirectional_search(lambda id_num: friends_dict.get(id_num, []), 1, 10, 2)
+print(links)
+assert sorted(links) == [[1, 2, 12, 10], [1, 3, 12, 10]]
+
+print("Testing bidirectional search when there is no link:")
+links = bidirectional_search(lambda id_num: friends_dict.get(id_num, []), 1, 10, 1)
+print(links)
+assert links == []
+
+print("Testing that search stops early:")
+asked_ids = []
+
+
+def counting_friends(id_num):
+    """
+    Return friends of the user and remember that they were asked for.
+    :param id_num: int
+    :return: list of int
+    """
+    asked_ids.append(id_num)
+    return friends_dict.get(id_num, [])
+
+
+links = bidirectional_search(counting_friends, 12, 1, 3)
+print(links, asked_ids)
+assert links == [[12, 3, 1]] and len(asked_ids) == 2
+
+print("Testing that crawler gets friends of each user once:")
+asked_ids = []
+crawler = FrontierCrawler(counting_friends)
+graph_1, graph_2 = crawler.crawl(1, 2), crawler.crawl(10, 3)
+print(crawler.get_fetch_counts(), asked_ids)
+assert graph_1.all_ids() == graph_from_dict(1, friends_dict, 2).all_ids()
+assert graph_2.all_ids() == graph_from_dict(10, friends_dict, 3).all_ids()
+assert crawler.get_fetch_counts() == [2, 5, 2] and sorted(asked_ids) == [1, 2, 3, 4, 7, 10, 11, 12, 13]
+asked_ids = []
+graph_1 = FrontierCrawler(counting_friends).crawl(4, 9)
+assert len(graph_1) == 1 and asked_ids == [4]
+
+print("Testing continuing a stopped search from its checkpoint:")
+
+
+def crashing_friends(id_num):
+    """
+    Return friends of the user, but stop working after 4 users.
+    :param id_num: int
+    :return: list of int
+    """
+    if len(asked_ids) == 4:
+        raise ConnectionError("Connection lost.")
+    return counting_friends(id_num)
+
+
+asked_ids = []
+checkpoint = CrawlCheckpoint("crawl_checkpoint_test.txt", interval=3)
+checkpoint.start("friends all test", 3)
+try:
+    FrontierCrawler(crashing_friends, checkpoint=checkpoint).crawl(1, 3)
+except ConnectionError:
+    checkpoint.save()
+checkpoint = CrawlCheckpoint("crawl_checkpoint_test.txt")
+assert checkpoint.load() and checkpoint.get_command() == "friends all test" and checkpoint.get_depth() == 3
+print(checkpoint.get_friends())
+assert sorted(checkpoint.get_friends()) == [1, 2, 3, 4]
+asked_ids = []
+crawler = FrontierCrawler(counting_friends, checkpoint=checkpoint)
+graph_1 = crawler.crawl(1, checkpoint.get_depth())
+print(asked_ids, crawler.get_fetch_counts())
+assert graph_1.in_file_tree() == graph_from_dict(1, friends_dict, 3).in_file_tree()
+assert sorted(asked_ids) == [5, 6, 7, 12] and crawler.get_fetch_counts() == [0, 0, 4]
+checkpoint.remove()
+assert not checkpoint.exists()
+
+print("Testing that graph of friends gives the same results as tree of friends:")
+tree_1, tree_2 = tree_from_dict(1, friends_dict, 2), tree_from_dict(10, friends_dict, 2)
+graph_1, graph_2 = graph_from_dict(1, friends_dict, 2), graph_from_dict(10, friends_dict, 2)
+print(graph_1, graph_2)
+assert sorted(tree_ids(tree_1)) == sorted(tree_ids(graph_1))
+assert sorted(tree_edges(tree_1)) == sorted(tree_edges(graph_1))
+mutual_ids = find_mutual_ids(graph_1, graph_2)
+print(mutual_ids)
+assert sorted(mutual_ids) == sorted(find_mutual_ids(tree_1, tree_2))
+mutual_depths = find_mutual_depths(graph_1, graph_2)
+print(mutual_depths)
+assert sorted(mutual_depths) == sorted(find_mutual_depths(tree_1, tree_2))
+assert mutual_depths == [(3, 1, 2), (12, 2, 1), (7, 2, 2)]
+print([link_to_list(id_num, graph_1, graph_2) for id_num in mutual_ids])
+assert [link_to_list(id_num, graph_1, graph_2) for id_num in mutual_ids] == [[1, 3, 12, 10], [1, 2, 12, 10],
+                                                                             [1, 3, 7, 11, 10]]
+assert find_min_link(mutual_ids, graph_1, graph_2) == 3
+links = list(iter_shortest_links(graph_1, graph_2))
+print(links)
+assert links == [[1, 3, 12, 10], [1, 2, 12, 10], [1, 3, 7, 11, 10]]
+assert sorted(links) == sorted(iter_shortest_links(tree_1, tree_2))
+links_iter = iter_shortest_links(graph_from_dict(1, {1: [2, 3], 2: [4], 3: [4]}, 2),
+                                 graph_from_dict(10, {10: [4, 5], 5: [4]}, 2))
+assert next(links_iter) == [1, 2, 4, 10] and next(links_iter) == [1, 3, 4, 10]
+assert list(links_iter) == []
+assert list(iter_shortest_links(graph_from_dict(1, {1: [5], 5: [6]}, 2),
+                                graph_from_dict(2, {2: [5], 5: [6]}, 2))) == [[1, 5, 2]]
+for seed in range(50):
+    random_dict = dict((id_num, friends_ids.tolist())
+                       for id_num, friends_ids in generate_power_law_graph(60, 2, seed).items())
+    for link in iter_shortest_links(graph_from_dict(10, random_dict, 3), graph_from_dict(20, random_dict, 3)):
+        assert len(set(link)) == len(link)
+print(links_trie(links))
+assert links_trie([[1, 3, 12, 10], [1, 2, 12, 10], [1, 3, 7, 11, 10]]) == \
+    {1: {3: {12: {10: {}}, 7: {11: {10: {}}}}, 2: {12: {10: {}}}}}
+assert sorted(trie_edges(links_trie([[1, 3, 12], [1, 3, 7]]))) == [(1, 3), (3, 7), (3, 12)]
+print(rank_mutual_ids(graph_1, graph_2))
+assert rank_mutual_ids(graph_1, graph_2) == [3, 12, 7] and rank_mutual_ids(tree_1, tree_2)[2] == 7
+assert rank_mutual_ids(graph_1, graph_2, 2) == [3, 12]
+assert rank_mutual_ids(graph_1, graph_2, 0) == []
+for id_num in mutual_ids:
+    assert link_to_list(id_num, graph_1, graph_2) == link_to_list(id_num, tree_1, tree_2)
+    assert find_link_length(id_num, graph_1, graph_2) == find_link_length(id_num, tree_1, tree_2)
+assert [user.get_id_num() for user in tree_1.users_of_level(2)] == graph_1.users_of_level(2)
+
+print("Testing getting friends at the same time from fake Twitter API with latency:")
+
+
+set_request_scheduler(RateLimitScheduler({"get_user": (1000, 15 * 60), "friends_ids": (1000, 15 * 60)},
+                                         FakeClock()))
+fake_api = FakeTwitterAPI(friends_dict, 0.02)
+start_time = time.time()
+tree_1 = build_friend_tree(fake_api, 1, 3)
+one_worker_time = time.time() - start_time
+start_time = time.time()
+tree_2 = build_friend_tree(fake_api, 1, 3, workers=8)
+eight_workers_time = time.time() - start_time
+print(one_worker_time, eight_workers_time)
+assert tree_1.in_file_tree() == tree_2.in_file_tree() and eight_workers_time < one_worker_time
+assert build_friend_graph(fake_api, 1, 3, workers=8).all_ids() == build_friend_graph(fake_api, 1, 3).all_ids()
+
+
+class TweepyLikeAPI(tweepy.API):
+    """
+    tweepy api object which takes friends of users from FakeTwitterAPI, keeps the response of the last
+    request in last_response (with rate limit headers) like tweepy does, and counts requests which are
+    made at the same time.
+    """
+    def __init__(self, fake_api):
+        """
+        Initialise TweepyLikeAPI by FakeTwitterAPI which answers requests.
+        :param fake_api: FakeTwitterAPI
+        """
+        tweepy.API.__init__(self)
+        self.fake_api = fake_api
+        self.lock = threading.Lock()
+
+        # Number of requests which are being made now and the biggest such number (copies of the object
+        # share them):
+        self.active = {"now": 0, "most": 0}
+
+    def _answer(self, request_func, remaining):
+        """
+        Return request_func() and keep response with given number of requests left in last_response.
+        :param request_func: function
+        :param remaining: int
+        :return: object
+        """
+        with self.lock:
+            self.active["now"] += 1
+            self.active["most"] = max(self.active["most"], self.active["now"])
+        try:
+            result = request_func()
+        finally:
+            with self.lock:
+                self.active["now"] -= 1
+        self.last_response = types.SimpleNamespace(headers={"x-rate-limit-remaining": str(remaining)})
+        return result
+
+    def get_user(self, user_name):
+        """
+        Same as FakeTwitterAPI.get_user().
+        :param user_name: int or str
+        :return: FakeTwitterUser
+        """
+        return self._answer(lambda: self.fake_api.get_user(user_name), 800)
+
+    def friends_ids(self, user_id, cursor=-1):
+        """
+        Same as FakeTwitterAPI.friends_ids(), and Twitter says that (500 + user_id) requests are left.
+        :param user_id: int
+        :param cursor: int
+        :return: tuple
+        """
+        return self._answer(lambda: self.fake_api.friends_ids(user_id, cursor), 500 + user_id)
+
+
+print("Testing that requests through one tweepy api object are made at the same time:")
+scheduler = RateLimitScheduler({"get_user": (1000, 15 * 60), "friends_ids": (1000, 15 * 60)}, FakeClock())
+set_request_scheduler(scheduler)
+tweepy_api = TweepyLikeAPI(FakeTwitterAPI(friends_dict, 0.02))
+start_time = time.time()
+assert build_friend_tree(tweepy_api, 1, 3).in_file_tree() == tree_1.in_file_tree()
+one_worker_time = time.time() - start_time
+start_time = time.time()
+assert build_friend_tree(tweepy_api, 1, 3, workers=8).in_file_tree() == tree_1.in_file_tree()
+eight_workers_time = time.time() - start_time
+print(one_worker_time, eight_workers_time, tweepy_api.active)
+assert eight_workers_time < one_worker_time
+# Responses are kept only in copies of the api object made for each thread:
+assert tweepy_api.active["most"] > 1 and not hasattr(tweepy_api, "last_response")
+assert get_friends_ids(tweepy_api, 7) == [8] and scheduler.remaining("friends_ids") == 507
+
+print("Testing waiting for the end of the window when there are no requests left:")
+fake_clock = FakeClock()
+scheduler = RateLimitScheduler(clock=fake_clock)
+set_request_scheduler(scheduler)
+# Scheduler knows that there are 15 requests for friends in a window, but Twitter allows only 3:
+fake_api = FakeTwitterAPI(friends_dict, 0, limits={"friends_ids": (3, 15 * 60)}, clock=fake_clock)
+tree_2 = build_friend_tree(fake_api, 1, 3)
+print(fake_clock.time(), scheduler.waits)
+assert tree_1.in_file_tree() == tree_2.in_file_tree()
+assert fake_clock.time() == 2 * 15 * 60 and scheduler.waits == {"friends_ids": 2}
+assert scheduler.remaining("get_user") > 800
+
+print("Testing that waiting for a window is printed once when many workers wait:")
+# One request in a window of 0.3 seconds, so 4 windows are waited for by 5 threads:
+test_scheduler = RateLimitScheduler({"friends_ids": (1, 0.3)})
+test_output = io.StringIO()
+with contextlib.redirect_stdout(test_output):
+    test_threads = [threading.Thread(target=test_scheduler.acquire, args=("friends_ids",)) for i in range(5)]
+    for test_thread in test_threads:
+        test_thread.start()
+    for test_thread in test_threads:
+        test_thread.join()
+print(test_output.getvalue(), test_scheduler.waits)
+assert test_output.getvalue().count("Rate limit for 'friends_ids' reached!") == 4
+assert test_scheduler.waits == {"friends_ids": 10}
+
+print("Testing reading rate limit from headers of Twitter response:")
+scheduler.update_from_headers("friends_ids", {"x-rate-limit-remaining": "0",
+                                              "x-rate-limit-reset": str(fake_clock.time() + 100)})
+scheduler.acquire("friends_ids")
+print(fake_clock.time())
+assert fake_clock.time() == 2 * 15 * 60 + 100
+
+print("Testing getting ids of friends page by page:")
+fake_api = FakeTwitterAPI(friends_dict, 0, page_size=2)
+friends_ids = get_friends_ids(fake_api, 1)
+print(friends_ids, fake_api.requests_num)
+assert friends_ids == [2, 3, 4] and fake_api.requests_num == 2
+
+print("Testing getting screen names by 100 at a time:")
+fake_api = FakeTwitterAPI(dict((id_num, []) for id_num in range(250)), 0)
+test_cache = NameCache("names_cache_test.txt", max_size=200)
+names = get_screen_names(fake_api, list(range(250)) + [1000], test_cache)
+print(names[0], names[249], names[1000], len(test_cache), fake_api.requests_num)
+assert names[0] == "user_0" and names[249] == "user_249" and names[1000] == "1000"
+assert len(test_cache) == 200 and fake_api.requests_num == 3
+
+print("Testing reading screen names from the file of a cache:")
+test_cache = NameCache("names_cache_test.txt")
+test_cache.load()
+names = get_screen_names(fake_api, list(range(50, 250)), test_cache)
+print(len(test_cache), fake_api.requests_num)
+assert names[50] == "user_50" and fake_api.requests_num == 3
+os.remove("names_cache_test.txt")
+
+print("Testing continuing building a graph into a cache after it was interrupted:")
+if os.path.exists("user_tree_functions_test.db"):
+    os.remove("user_tree_functions_test.db")
+cache = FriendsCache("user_tree_functions_test.db")
+fake_api = FakeTwitterAPI(friends_dict, 0)
+fake_api.crash_after = 4
+try:
+    build_friend_graph(fake_api, 1, 3, cache=cache)
+except ConnectionError:
+    print("Interrupted after {} users.".format(len(cache)))
+assert len(cache) == 4
+fake_api.crash_after = None
+graph_1 = build_friend_graph(fake_api, 1, 3, cache=cache)
+print(graph_1, len(cache), fake_api.requests_num)
+assert graph_1.all_ids() == build_friend_graph(FakeTwitterAPI(friends_dict, 0), 1, 3).all_ids()
+assert len(cache) == fake_api.requests_num - 1 == 8
+cache.close()
+os.remove("user_tree_functions_test.db")
+
+print("Testing using old information from a cache while it is refreshed:")
+fake_clock = FakeClock()
+cache = FriendsCache("user_tree_functions_test.db", ttl=100, clock=fake_clock)
+fake_api = FakeTwitterAPI({1: [2, 3]}, 0)
+print(get_cached_friends_ids(fake_api, cache, 1), fake_api.requests_num)
+fake_api.friends_dict[1] = [2, 3, 4]
+fake_clock.sleep(50)
+assert get_cached_friends_ids(fake_api, cache, 1) == [2, 3] and fake_api.requests_num == 1
+fake_clock.sleep(100)
+print(get_cached_friends_ids(fake_api, cache, 1))
+wait_for_refreshes()
+print(get_cached_friends_ids(fake_api, cache, 1), fake_api.requests_num)
+assert get_cached_friends_ids(fake_api, cache, 1) == [2, 3, 4] and fake_api.requests_num == 2
+cache.close()
+os.remove("user_tree_functions_test.db")
+
+
+class FailingTwitterAPI(FakeTwitterAPI):
+    """
+    Fake Twitter API on which requests for friends of some users fail.
+    """
+    def __init__(self, friends_dict, failing_ids, status_code=None):
+        """
+        Initialise FailingTwitterAPI by friends of users, ids of users whose friends can't be got and status
+        code of responses to those requests (None if connection is lost).
+        :param friends_dict: dict
+        :param failing_ids: list of int
+        :param status_code: int or NoneType
+        """
+        FakeTwitterAPI.__init__(self, friends_dict)
+        self.failing_ids = failing_ids
+        self.status_code = status_code
+
+    def friends_ids(self, user_id, cursor=-1):
+        """
+        Same as FakeTwitterAPI.friends_ids(), but raise tweepy.error.TweepError for failing users.
+        :param user_id: int
+        :param cursor: int
+        :return: tuple
+        """
+        if user_id in self.failing_ids:
+            response = None if self.status_code is None else types.SimpleNamespace(status_code=self.status_code)
+            raise tweepy.error.TweepError("Request failed.", response)
+        return FakeTwitterAPI.friends_ids(self, user_id, cursor)
+
+
+print("Testing that failed requests are not written into a cache:")
+cache = FriendsCache("user_tree_functions_test.db")
+try:
+    get_cached_friends_ids(FailingTwitterAPI({1: [2, 3]}, [1]), cache, 1)
+    assert False
+except tweepy.error.TweepError:
+    pass
+assert cache.get_friends(1) is None
+print(get_cached_friends_ids(FailingTwitterAPI({1: [2, 3]}, [1], 401), cache, 1))
+assert cache.get_friends(1) == [] and get_cached_friends_ids(FakeTwitterAPI({1: [2, 3]}), cache, 1) == []
+cache.close()
+os.remove("user_tree_functions_test.db")
+
+print("Testing that failed refreshes and refreshes which searches need requests for keep old information:")
+fake_clock = FakeClock()
+scheduler = RateLimitScheduler({"friends_ids": (3, 15 * 60)}, clock=fake_clock)
+set_request_scheduler(scheduler)
+cache = FriendsCache("user_tree_functions_test.db", ttl=100, clock=fake_clock)
+cache.set_many_friends([(1, [2, 3]), (4, [5])])
+fake_clock.sleep(200)
+get_cached_friends_ids(FailingTwitterAPI({1: [2, 3, 4]}, [1]), cache, 1)
+wait_for_refreshes()
+assert cache.get_friends(1) == [2, 3] and not cache.is_fresh(1)
+
+# Only one request of the window is left after a search takes one:
+scheduler.acquire("friends_ids")
+fake_api = FakeTwitterAPI({4: [5, 6]})
+get_cached_friends_ids(fake_api, cache, 4)
+wait_for_refreshes()
+print(cache.get_friends(4), fake_api.requests_num)
+assert cache.get_friends(4) == [5] and fake_api.requests_num == 0
+fake_clock.sleep(15 * 60)
+get_cached_friends_ids(fake_api, cache, 4)
+wait_for_refreshes()
+assert cache.get_friends(4) == [5, 6] and fake_api.requests_num == 1
+cache.close()
+os.remove("user_tree_functions_test.db")
+set_request_scheduler(RateLimitScheduler(clock=fake_clock))
+
+print("Testing getting from Twitter only friends which are not in a cache:")
+cache = FriendsCache("user_tree_functions_test.db")
+cache.set_many_friends([(1, friends_dict[1]), (2, friends_dict[2])])
+fake_api = FakeTwitterAPI(friends_dict, 0)
+tree_2 = build_friend_tree(fake_api, 1, 3, cache=cache)
+print(len(cache), fake_api.requests_num)
+assert tree_2.in_file_tree() == tree_1.in_file_tree()
+assert len(cache) == 8 and fake_api.requests_num == 6
+cache.close()
+os.remove("user_tree_functions_test.db")
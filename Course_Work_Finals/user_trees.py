@@ -1,3 +1,7 @@
+from collections import deque
+from profiler import profiler, profiled
+
+
 class User:
     """
     Node of tree of users and their friends.
@@ -22,6 +26,16 @@ class User:
         # higher in a tree:
         self.already_was_in_tree = False
 
+        # Level of a user in a tree (it is set when user is
+        # added to a tree):
+        self._level = 0
+
+        # First occurrences of all users of a tree by their ids
+        # and lists of users of each level (only root of a tree
+        # keeps them):
+        self._first_occurrences = {id_num: self}
+        self._levels = [[self]]
+
     def get_parent(self):
         """
         Return parent user of this one.
@@ -88,38 +102,73 @@ class User:
         :param ignore_repeated: bool
         :return: list
         """
-        result_list = []
+        # Skipping current user:
+        users = self.iter_preorder(ignore_repeated)
+        next(users)
 
-        # This is a recursive method:
+        return list(users)
 
-        # If current user does not have children (friends):
-        if self._children is None:
-            # Return an empty list:
-            return []
-        # Otherwise:
-        else:
-            for child in self._children:
-                # Condition to ignore repeated users:
-                if not (ignore_repeated and
-                        child.already_was_in_tree):
-                    result_list.append(child)
-                    # Recursive call:
-                    result_list = result_list + \
-                        child.all_users(ignore_repeated)
+    def iter_preorder(self, ignore_repeated=True):
+        """
+        Iterate over current user and all users of his tree in
+        the same order as all_users() returns them (parent goes
+        before his children). Iterative, so deep trees don't hit
+        the recursion limit.
+        :param ignore_repeated: bool
+        :return: generator of User
+        """
+        stack = [self]
+
+        while stack:
+            user = stack.pop()
+            yield user
+
+            # Adding children in reversed order so that the first
+            # child is taken first:
+            for child in reversed(user.get_children(ignore_repeated)):
+                stack.append(child)
+
+    def iter_bfs(self, ignore_repeated=True):
+        """
+        Iterate over current user and all users of his tree level
+        by level (breadth-first).
+        :param ignore_repeated: bool
+        :return: generator of User
+        """
+        queue = deque([self])
 
-            return result_list
+        while queue:
+            user = queue.popleft()
+            yield user
+            queue.extend(user.get_children(ignore_repeated))
+
+    def iter_leaves(self, ignore_repeated=True):
+        """
+        Iterate over users of a tree with current user as a root
+        who have no children (friends) in the same order as
+        iter_preorder().
+        :param ignore_repeated: bool
+        :return: generator of User
+        """
+        for user in self.iter_preorder(ignore_repeated):
+            if not user._children:
+                yield user
 
     def height(self):
         """
         Return height of a tree with current user as a root.
         :return: int
         """
+        # Root knows all levels of a tree:
+        if self.is_root():
+            return len(self._levels) - 1
+
         h = 0
         current_node = self
 
         # Going down until there is nowhere to go (it is
         # assumed that tree is perfectly balanced every time):
-        while current_node._children is not None:
+        while current_node._children:
             h += 1
             current_node = current_node._children[0]
 
@@ -132,7 +181,7 @@ class User:
         is 0, level of children of the root is 1, and so fourth).
         :return: int
         """
-        return self.get_root().height() - self.height()
+        return self._level
 
     def users_of_level(self, level_num, ignore_repeated=True):
         """
@@ -147,6 +196,14 @@ class User:
             raise ValueError("Number of level in tree "
                              "of users must be int.")
 
+        # Root knows users of each level:
+        if self.is_root():
+            if not (0 <= level_num < len(self._levels)):
+                return []
+            return [user for user in self._levels[level_num]
+                    if not (ignore_repeated and
+                            user.already_was_in_tree)]
+
         # Main part:
         result_list = []
 
@@ -168,7 +225,7 @@ class User:
         """
         # Searching in tree of main root for first occurrence
         # of user with id of given one:
-        return self.get_root().user_by_id(self.get_id_num())
+        return self.get_root()._first_occurrences.get(self.get_id_num())
 
     def user_by_id(self, id_num):
         """
@@ -178,6 +235,10 @@ class User:
         :param id_num: int
         :return: User or NoneType
         """
+        # Root knows first occurrences of all users of a tree:
+        if self.is_root():
+            return self._first_occurrences.get(id_num)
+
         # Checking levels of tree from top to bottom (to get non-repeated user version first):
         for level in range(self.height() + 1):
             # If there is a user with given id on that level:
@@ -203,6 +264,7 @@ class User:
         # Setting:
         self._parent = parent
 
+    @profiled("set_children")
     def set_children(self, list_of_children):
         """
         Set children (friends) of a current User. It includes
@@ -218,25 +280,79 @@ class User:
             raise ValueError("List of children must be a list "
                              "containing User objects only.")
 
+        # First occurrences and levels of users of a main tree:
+        root = self.get_root()
+        first_occurrences = root._first_occurrences
+        levels = root._levels
+
+        # Removing current children and their trees from first
+        # occurrences and levels:
+        if self._children:
+            removed_users = set()
+            for child in self._children:
+                removed_users.update(
+                    child.iter_preorder(ignore_repeated=False))
+
+            lost_ids = set()
+            for user in removed_users:
+                if first_occurrences.get(user.get_id_num()) is user:
+                    del first_occurrences[user.get_id_num()]
+                    lost_ids.add(user.get_id_num())
+
+            for level in range(self._level + 1, len(levels)):
+                levels[level] = [user for user in levels[level]
+                                 if user not in removed_users]
+            while len(levels) > 1 and not levels[-1]:
+                levels.pop()
+
+            # Repeated users whose first occurrences were removed
+            # become first occurrences (the highest ones are
+            # taken):
+            for level in levels:
+                if not lost_ids:
+                    break
+                for user in level:
+                    if user.get_id_num() in lost_ids:
+                        user.already_was_in_tree = False
+                        first_occurrences[user.get_id_num()] = user
+                        lost_ids.discard(user.get_id_num())
+
         # Clearing current list of children:
         self._children = []
+        profiler.count("users_created", len(list_of_children))
 
         # Adding children to a list, also checking each one for
         # previous occurrences in a main tree:
-        root = self.get_root()
-
-        # For each child in list of children:
         for child in list_of_children:
             # If user with the same id is in the main tree:
-            if child.get_id_num() in [user.get_id_num()
-                                      for user in
-                                      root.all_users()]:
+            if child.get_id_num() in first_occurrences:
                 child.already_was_in_tree = True
+            else:
+                first_occurrences[child.get_id_num()] = child
             # Add child:
             self._children.append(child)
             # Set parent of a child:
             child.set_parent(self)
 
+            # Child is not a root anymore, so moving first
+            # occurrences of users of its tree to the main tree:
+            if not child.already_was_in_tree:
+                for user in child.all_users():
+                    if user.get_id_num() not in first_occurrences:
+                        first_occurrences[user.get_id_num()] = user
+            child._first_occurrences = None
+            child._levels = None
+
+            # Setting levels of child and users of its tree and
+            # adding them to levels of the main tree:
+            child_tree = [child] + \
+                child.all_users(ignore_repeated=False)
+            for user in child_tree:
+                user._level = user.get_parent()._level + 1
+                if user._level == len(levels):
+                    levels.append([])
+                levels[user._level].append(user)
+
     def __str__(self):
         """
         Return string representation of a User.
@@ -277,14 +393,12 @@ class User:
         Return in file representation of all users of a tree with current user as a root.
         :return: str
         """
-        # Adding current user:
-        result_str = self.in_file_user()
-
-        # Adding all other users:
-        all_users = self.all_users()
-        for user in all_users:
-            if user.get_level() != user.get_root().height():
-                result_str = result_str + user.in_file_user()
+        # Users of the last level of a main tree have no friends
+        # in it:
+        last_level = self.get_root().height()
 
-        # Returning:
-        return result_str
+        # Adding current user and all other users:
+        return "".join(user.in_file_user() for user in
+                       self.iter_preorder()
+                       if user is self or
+                       user.get_level() != last_level)
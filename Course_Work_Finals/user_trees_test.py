@@ -20,3 +20,26 @@ print(root_user.all_users(ignore_repeated=False))
 print("Checking __str__ method:")
 print(User(327))
 print(root_user)
+
+print("Checking first occurrences of repeated users:")
+root_user.get_children()[1].set_children([User(12), User(500)])
+repeated_user = root_user.get_children()[1].get_children(ignore_repeated=False)[0]
+print(repeated_user.already_was_in_tree, repeated_user.first_occur() is root_user.get_children()[0])
+print(repr(root_user.user_by_id(500)), root_user.user_by_id(1) is root_user, root_user.user_by_id(999))
+
+print("Checking levels:")
+print(root_user.height(), root_user.users_of_level(1), root_user.users_of_level(2))
+print(root_user.users_of_level(2, ignore_repeated=False), root_user.user_by_id(500).get_level())
+
+print("Checking traversal generators:")
+print(list(root_user.iter_preorder()))
+print(list(root_user.iter_bfs()))
+print(list(root_user.iter_leaves(ignore_repeated=False)))
+
+print("Checking replacing children whose users are repeated somewhere else:")
+root_user.get_children()[0].set_children([User(600)])
+promoted_user = root_user.user_by_id(234)
+print(repr(promoted_user), repr(promoted_user.get_parent()), promoted_user.already_was_in_tree)
+assert promoted_user.get_parent() is root_user.get_children()[2] and not promoted_user.already_was_in_tree
+assert root_user.user_by_id(455).first_occur() is root_user.user_by_id(455)
+assert root_user.user_by_id(12) is root_user.get_children()[0]